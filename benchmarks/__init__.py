@@ -0,0 +1,10 @@
+"""
+benchmarks for the viewgroups hot paths
+
+a self contained project (sqlite, no extra dependencies) with seeded
+orders, customers, tags and notes, run with
+
+    python -m benchmarks.run --rows 10000 100000 --output before.json
+    python -m benchmarks.run --rows 10000 100000 --output after.json
+    python -m benchmarks.run --compare before.json after.json
+"""
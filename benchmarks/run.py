@@ -0,0 +1,291 @@
+"""
+runs every scenario against a seeded database per row count and
+prints (or writes) the results as json
+
+    python -m benchmarks.run --rows 10000 100000 1000000
+    python -m benchmarks.run --scenario list --scenario search --repeat 10
+    python -m benchmarks.run --compare before.json after.json
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "benchmarks.settings")
+
+SCENARIOS = []
+
+
+def scenario(name):
+    def inner(func):
+        SCENARIOS.append((name, func))
+        return func
+    return inner
+
+
+@scenario("list")
+def list_page(client, data):
+    return client.get("/orders/", {"page": 2})
+
+
+@scenario("filter")
+def filter_page(client, data):
+    return client.get("/orders/", {"status__exact": "paid", "urgent__exact": 1})
+
+
+@scenario("search")
+def search_page(client, data):
+    return client.get("/orders/", {"q": "Customer 12"})
+
+
+@scenario("sort")
+def sort_page(client, data):
+    return client.get("/orders/", {"sort": "-total,status"})
+
+
+@scenario("autocomplete")
+def autocomplete_json(client, data):
+    return client.get("/customers/autocomplete/", {"q": "Customer 4"})
+
+
+@scenario("delete_selected")
+def delete_selected_confirm(client, data):
+    # the confirmation step, nothing is deleted
+    return client.post("/orders/", {
+        "action": "delete_selected",
+        "selected": data["selected"],
+    })
+
+
+@scenario("delete_selected_across")
+def delete_selected_across_confirm(client, data):
+    client.get("/orders/", {"status__exact": "cancelled"})
+    return client.post("/orders/", {
+        "action": "delete_selected",
+        "select_across": "1",
+    })
+
+
+@scenario("inline_edit")
+def inline_edit_page(client, data):
+    return client.get("/orders/%s/edit/" % data["order"])
+
+
+@scenario("inline_edit_threads")
+def inline_edit_threaded(client, data, threads=8, requests=4):
+    # one edit view hammered from several threads, each response must
+    # hold the inline forms of its own order and nobody else's
+    from concurrent.futures import ThreadPoolExecutor
+    from django.db import connection
+    from django.db.models import Count
+    from django.test import Client
+
+    from .shop.models import Order
+
+    orders = dict(Order.objects.filter(pk__gte=data["order"])
+        .annotate(lines=Count("orderline"))
+        .order_by("pk").values_list("pk", "lines")[:threads])
+
+    def edit(pk):
+        try:
+            client = Client()
+            for n in range(requests):
+                response = client.get("/orders/%s/edit/" % pk)
+                assert response.status_code == 200, response.status_code
+                html = response.content.decode()
+                initial = re.search(
+                    r'name="orderline_set-INITIAL_FORMS" value="(\d+)"', html)
+                parents = set(re.findall(
+                    r'name="orderline_set-\d+-order" value="(\d+)"', html))
+                assert int(initial.group(1)) == orders[pk], \
+                    "order %s rendered %s lines" % (pk, initial.group(1))
+                assert parents <= set([str(pk)]), \
+                    "order %s rendered lines of %s" % (pk, parents)
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for result in [pool.submit(edit, pk) for pk in orders]:
+            result.result()
+
+
+@scenario("url_building")
+def build_urls(client, data):
+    from django.urls import clear_url_caches, reverse
+    from viewsets.views import ViewSet
+
+    links = [(m, dict((k, v[:]) for k, v in m.links.items()))
+        for m in ViewSet.managers]
+    ViewSet.all_urls()
+    for manager, saved in links:
+        manager.links = saved
+
+    clear_url_caches()
+    reverse("orders:list")
+    reverse("orders:detail", args=[data["order"]])
+    reverse("customers:autocomplete")
+
+
+@scenario("import_time")
+def import_viewsets(client, data):
+    # a fresh interpreter booting django and importing the package, so
+    # import time regressions show up (includes interpreter startup)
+    subprocess.check_call([sys.executable, "-c",
+        "import django; django.setup(); "
+        "import viewsets.views, viewsets.inline, viewsets.templatetags.form_tags"])
+
+
+def use_database(rows, reseed=False):
+    """ points the default connection at the database for rows, seeds it """
+    from django.conf import settings
+    from django.core.management import call_command
+    from django.db import connection
+
+    from .seed import seed
+    from .shop.models import Order
+
+    if not os.path.isdir(settings.BENCH_DIR):
+        os.makedirs(settings.BENCH_DIR)
+    path = os.path.join(settings.BENCH_DIR, "bench-%s.sqlite3" % rows)
+
+    connection.close()
+    connection.settings_dict["NAME"] = path
+    if reseed and os.path.exists(path):
+        os.remove(path)
+
+    call_command("migrate", run_syncdb=True, verbosity=0)
+    if Order.objects.count() != rows:
+        connection.close()
+        os.remove(path)
+        call_command("migrate", run_syncdb=True, verbosity=0)
+        started = time.perf_counter()
+        seed(rows)
+        sys.stderr.write("seeded %s rows in %.1fs\n" % (
+            rows, time.perf_counter() - started))
+
+    first = Order.objects.order_by("pk").values_list("pk", flat=True)[0]
+    return {
+        "order": first,
+        "selected": [str(first + n) for n in range(25)],
+    }
+
+
+def measure(func, data, repeat):
+    from django.db import connection, reset_queries
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+
+    def call():
+        # a fresh client so session stored filters don't leak across
+        response = func(Client(), data)
+        if response is not None:
+            assert response.status_code < 400, response.status_code
+            response.content
+
+    call()  # warm up
+
+    timings = []
+    for n in range(repeat):
+        # the query log is a bounded deque, keep it from saturating
+        reset_queries()
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            call()
+            timings.append((time.perf_counter() - started) * 1000)
+        query_count = len(queries.captured_queries)
+
+    tracemalloc.start()
+    call()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "latency_ms": {
+            "min": round(min(timings), 3),
+            "median": round(statistics.median(timings), 3),
+            "max": round(max(timings), 3),
+        },
+        "queries": query_count,
+        "peak_memory_kb": round(peak / 1024.0, 1),
+    }
+
+
+def run(rows_list, names, repeat, reseed=False):
+    django.setup()
+
+    results = []
+    for rows in rows_list:
+        data = use_database(rows, reseed)
+        for name, func in SCENARIOS:
+            if names and name not in names:
+                continue
+            result = {"scenario": name, "rows": rows}
+            result.update(measure(func, data, repeat))
+            results.append(result)
+            sys.stderr.write("%(scenario)s@%(rows)s: %(median)sms\n" % dict(
+                result, median=result["latency_ms"]["median"]))
+
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def compare(before_path, after_path):
+    with open(before_path) as before_file, open(after_path) as after_file:
+        before, after = json.load(before_file), json.load(after_file)
+
+    previous = dict(((r["scenario"], r["rows"]), r) for r in before["results"])
+    lines = ["%-24s %9s %12s %12s %8s %8s" % (
+        "scenario", "rows", "before ms", "after ms", "queries", "change")]
+    for result in after["results"]:
+        old = previous.get((result["scenario"], result["rows"]))
+        if not old:
+            continue
+        old_ms = old["latency_ms"]["median"]
+        new_ms = result["latency_ms"]["median"]
+        lines.append("%-24s %9s %12.2f %12.2f %4s>%-3s %+7.1f%%" % (
+            result["scenario"], result["rows"], old_ms, new_ms,
+            old["queries"], result["queries"],
+            (new_ms - old_ms) / old_ms * 100 if old_ms else 0))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000])
+    parser.add_argument("--scenario", action="append", dest="scenarios",
+        choices=[name for name, func in SCENARIOS])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--reseed", action="store_true")
+    parser.add_argument("--output")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        print(compare(*args.compare))
+        return
+
+    output = json.dumps(
+        run(args.rows, args.scenarios, args.repeat, args.reseed), indent=2)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+fills the benchmark database, `rows` is the number of orders
+
+customers are a tenth of the orders, only the first orders get lines
+so the inline edit page has a realistic size at every scale
+"""
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+
+from .shop.models import Customer, Note, Order, OrderLine, Region, Tag
+
+BATCH_SIZE = 5000
+STATUSES = [status for status, label in Order.STATUSES]
+
+
+def batched(factory, count, batch_size=BATCH_SIZE):
+    for start in range(0, count, batch_size):
+        yield [factory(n) for n in range(start, min(start + batch_size, count))]
+
+
+@transaction.atomic
+def seed(rows, lines_per_order=20, orders_with_lines=200):
+    # bulk_create doesn't return pks on every backend, read them back
+    Region.objects.bulk_create(
+        [Region(name="Region %s" % n) for n in range(20)])
+    regions = list(Region.objects.values_list("pk", flat=True))
+    Tag.objects.bulk_create([Tag(name="tag-%s" % n) for n in range(50)])
+    tags = list(Tag.objects.values_list("pk", flat=True))
+
+    customer_count = max(rows // 10, 1)
+    for batch in batched(lambda n: Customer(
+            name="Customer %s" % n,
+            email="customer%s@example.com" % n,
+            region_id=regions[n % len(regions)],
+            active=n % 7 != 0), customer_count):
+        Customer.objects.bulk_create(batch)
+    first_customer = Customer.objects.order_by("pk").values_list(
+        "pk", flat=True)[0]
+
+    for batch in batched(lambda n: Order(
+            customer_id=first_customer + n % customer_count,
+            status=STATUSES[n % len(STATUSES)],
+            total=(n * 37) % 10000,
+            urgent=n % 13 == 0), rows):
+        Order.objects.bulk_create(batch)
+    first_order = Order.objects.order_by("pk").values_list(
+        "pk", flat=True)[0]
+
+    Through = Order.tags.through
+    for batch in batched(lambda n: Through(
+            order_id=first_order + n,
+            tag_id=tags[n % len(tags)]), rows):
+        Through.objects.bulk_create(batch)
+
+    for batch in batched(lambda n: OrderLine(
+            order_id=first_order + n // lines_per_order,
+            product="Product %s" % (n % 500),
+            quantity=n % 9 + 1,
+            price=n % 1000), orders_with_lines * lines_per_order):
+        OrderLine.objects.bulk_create(batch)
+
+    order_type = ContentType.objects.get_for_model(Order)
+    for batch in batched(lambda n: Note(
+            content_type=order_type,
+            object_id=first_order + n % max(rows // 10, 1),
+            text="Note %s" % n), max(rows // 10, 1)):
+        Note.objects.bulk_create(batch)
@@ -0,0 +1,44 @@
+import os
+import tempfile
+
+BENCH_DIR = os.environ.get(
+    "VIEWSETS_BENCH_DIR",
+    os.path.join(tempfile.gettempdir(), "viewsets-benchmarks"))
+
+SECRET_KEY = "benchmarks"
+DEBUG = False
+ALLOWED_HOSTS = ["testserver"]
+USE_TZ = False
+
+INSTALLED_APPS = [
+    "django.contrib.contenttypes",
+    "django.contrib.auth",
+    "django.contrib.sessions",
+    "viewsets",
+    "benchmarks.shop",
+]
+
+MIDDLEWARE = [
+    "django.contrib.sessions.middleware.SessionMiddleware",
+    "django.contrib.auth.middleware.AuthenticationMiddleware",
+]
+
+DATABASES = {
+    "default": {
+        "ENGINE": "django.db.backends.sqlite3",
+        # switched per row count by benchmarks.run
+        "NAME": os.path.join(BENCH_DIR, "bench.sqlite3"),
+    }
+}
+
+SESSION_ENGINE = "django.contrib.sessions.backends.signed_cookies"
+
+TEMPLATES = [{
+    "BACKEND": "django.template.backends.django.DjangoTemplates",
+    "APP_DIRS": True,
+    "OPTIONS": {
+        "context_processors": ["django.template.context_processors.request"],
+    },
+}]
+
+ROOT_URLCONF = "benchmarks.urls"
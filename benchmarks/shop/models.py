@@ -0,0 +1,57 @@
+from django.contrib.contenttypes.fields import GenericForeignKey, \
+    GenericRelation
+from django.contrib.contenttypes.models import ContentType
+from django.db import models
+
+
+class Region(models.Model):
+    name = models.CharField(max_length=50)
+
+    def __str__(self):
+        return self.name
+
+
+class Customer(models.Model):
+    name = models.CharField(max_length=100)
+    email = models.CharField(max_length=100)
+    region = models.ForeignKey(Region, on_delete=models.CASCADE)
+    active = models.BooleanField(default=True)
+
+    def __str__(self):
+        return self.name
+
+
+class Tag(models.Model):
+    name = models.CharField(max_length=50)
+
+    def __str__(self):
+        return self.name
+
+
+class Note(models.Model):
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    content_object = GenericForeignKey()
+    text = models.CharField(max_length=200)
+
+
+class Order(models.Model):
+    STATUSES = [("new", "New"), ("paid", "Paid"), ("shipped", "Shipped"),
+        ("cancelled", "Cancelled")]
+
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE)
+    status = models.CharField(max_length=10, choices=STATUSES, default="new")
+    total = models.IntegerField(default=0)
+    urgent = models.BooleanField(default=False)
+    tags = models.ManyToManyField(Tag, blank=True)
+    notes = GenericRelation(Note)
+
+    def __str__(self):
+        return "Order #%s" % self.pk
+
+
+class OrderLine(models.Model):
+    order = models.ForeignKey(Order, on_delete=models.CASCADE)
+    product = models.CharField(max_length=100)
+    quantity = models.IntegerField(default=1)
+    price = models.IntegerField(default=0)
@@ -0,0 +1,232 @@
+import sqlite3
+import unittest
+from unittest import mock
+from types import SimpleNamespace
+
+from django import forms
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, transaction
+from django.http import QueryDict
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+
+from viewsets import cache
+from viewsets.checks import check_viewsets
+from viewsets.budgets import QueryBudgetTestMixin
+from viewsets.inline import Inline
+from viewsets.selection import Selection
+from viewsets.warmup import warmup
+
+from .models import Customer, Order, Region, Tag
+from .viewsets import OrderEditView, orders
+
+
+class FragmentedSelectionTest(TestCase):
+    """ select_across over every other order, 1200 runs of one pk each """
+
+    @classmethod
+    def setUpTestData(cls):
+        region = Region.objects.create(name="Region")
+        customer = Customer.objects.create(
+            name="Customer", email="customer@example.com", region=region)
+        Order.objects.bulk_create(
+            [Order(customer=customer) for n in range(2400)])
+        pks = Order.objects.order_by("pk").values_list("pk", flat=True)
+        Order.objects.filter(pk__in=list(pks[1::2])).delete()
+
+    def setUp(self):
+        # sqlite's historical default, django's own limit for bulk queries
+        connection.ensure_connection()
+        if connection.vendor == "sqlite":
+            connection.connection.setlimit(
+                sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, 999)
+
+    def confirm(self, action, **data):
+        response = self.client.post("/orders/", {
+            "action": action,
+            "select_across": "1",
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["count"], 1200)
+        data.update({
+            "action": action,
+            "select_across": "1",
+            "selection": response.context["selection"].token,
+            "confirmed": "1",
+        })
+        return response, self.client.post("/orders/", data)
+
+    def test_chunks(self):
+        selection = Selection.from_queryset(Order.objects.all())
+        self.assertEqual(selection.count, 1200)
+        self.assertTrue(selection.is_fragmented())
+        with self.assertRaises(ValueError):
+            selection.filter(Order.objects.all())
+
+        pks = []
+        for chunk_pks, chunk in selection.querysets(Order.objects.all(), 500):
+            self.assertLessEqual(len(chunk_pks), 500)
+            pks.extend(chunk.values_list("pk", flat=True))
+        self.assertEqual(
+            pks, list(Order.objects.order_by("pk").values_list("pk", flat=True)))
+
+    def test_delete_selected(self):
+        confirmation, response = self.confirm("delete_selected")
+        self.assertEqual(len(confirmation.context["sample"]), 20)
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Order.objects.exists())
+
+    def test_update_selected(self):
+        confirmation, response = self.confirm(
+            "update_selected", field="status", value_status="paid")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Order.objects.filter(status="paid").count(), 1200)
+
+
+class SharedChoicesTest(TestCase):
+    """ choices shared by the forms of an inline are only fetched to render """
+
+    def test_bound_formset(self):
+        region = Region.objects.create(name="Region")
+        customer = Customer.objects.create(
+            name="Customer", email="customer@example.com", region=region)
+        Tag.objects.bulk_create([Tag(name="tag-%s" % n) for n in range(3)])
+        tag = Tag.objects.order_by("pk")[0]
+
+        data = QueryDict(mutable=True)
+        data.update({
+            "order_set-TOTAL_FORMS": "1",
+            "order_set-INITIAL_FORMS": "0",
+            "order_set-0-status": "paid",
+            "order_set-0-tags": str(tag.pk),
+        })
+        inline = Inline(Order, fields=["status", "tags"]).bind(None, customer)
+        formset = inline.get_formset_class(customer)(data, instance=customer)
+
+        # the posted tag is looked up, the tag table isn't read
+        with self.assertNumQueries(1):
+            self.assertTrue(formset.is_valid())
+
+        # one query for the choices of every form
+        with self.assertNumQueries(1):
+            html = "".join(form.as_p() for form in formset.forms) + \
+                formset.empty_form.as_p()
+        self.assertEqual(html.count(">tag-2</option>"), 2)
+
+
+class StaffOrderForm(forms.ModelForm):
+    class Meta:
+        model = Order
+        fields = ["status", "total"]
+
+
+class StaffInline(Inline):
+    def get_form_class(self, request, instance=None, **kwargs):
+        if request is not None and request.user.is_staff:
+            return StaffOrderForm
+        return super(StaffInline, self).get_form_class(
+            request, instance, **kwargs)
+
+
+class InlineClassesTest(TestCase):
+    """ formset classes are kept per form class, which may vary by request """
+
+    def test_form_class_per_request(self):
+        customer = Customer(pk=1)
+        inline = StaffInline(Order, fields=["status"])
+        staff = SimpleNamespace(user=SimpleNamespace(is_staff=True))
+        visitor = SimpleNamespace(user=SimpleNamespace(is_staff=False))
+
+        for request in [visitor, staff, visitor]:
+            formset_class = inline.bind(request, customer) \
+                .get_formset_class(customer)
+            self.assertEqual(request.user.is_staff,
+                issubclass(formset_class.form, StaffOrderForm))
+        self.assertIs(formset_class, inline.bind(visitor, customer)
+            .get_formset_class(customer))
+
+
+class ObjectCacheTest(TransactionTestCase):
+    """ cached objects are dropped again once the write commits """
+
+    def test_read_before_commit(self):
+        cache.track(Customer, [Region])
+        region = Region.objects.create(name="Region")
+        customer = Customer.objects.create(
+            name="Customer", email="customer@example.com", region=region)
+        key = cache.object_key(Customer, "pk", customer.pk)
+        generation_key = cache.generation_key(Customer)
+
+        with transaction.atomic():
+            customer.name = "Renamed"
+            customer.save()
+            region.save()
+            # a GET that read the old row between the saves and the commit
+            generation = cache.get_cache().get(generation_key)
+            cache.get_cache().set(key, (generation, "Customer"))
+        self.assertIsNone(cache.get_cache().get(key))
+        self.assertNotEqual(cache.get_cache().get(generation_key), generation)
+
+
+class QueryBudgetTest(TestCase):
+    """ assertQueryBudgets doesn't pass views it couldn't test """
+
+    def run_budgets(self, budget, url_kwargs=None):
+        class Budgets(QueryBudgetTestMixin, SimpleTestCase):
+            databases = "__all__"
+
+            def get_budget_url_kwargs(self, viewset, name, groups):
+                if url_kwargs is not None:
+                    return url_kwargs
+                return super(Budgets, self).get_budget_url_kwargs(
+                    viewset, name, groups)
+
+            def test_budgets(self):
+                self.assertQueryBudgets([orders])
+
+        result = unittest.TestResult()
+        with mock.patch.object(orders, "query_budget", budget):
+            Budgets("test_budgets")(result)
+        return result
+
+    def test_empty_table_skips(self):
+        result = self.run_budgets({"list": 50, "detail": 50})
+        self.assertEqual(result.failures + result.errors, [])
+        self.assertEqual(len(result.skipped), 1)
+        self.assertIn("orders:detail", result.skipped[0][1])
+
+    def test_not_found_fails(self):
+        result = self.run_budgets({"detail": 50}, {"pk": 1})
+        self.assertEqual(len(result.failures), 1)
+        self.assertIn("answered 404", result.failures[0][1])
+
+    def test_unknown_view(self):
+        result = self.run_budgets({"export": 5})
+        self.assertEqual(len(result.errors), 1)
+        self.assertIn(ImproperlyConfigured.__name__, result.errors[0][1])
+
+
+class WarmupTest(TestCase):
+    """ warmup builds the classes the first edit page would """
+
+    def test_inline_classes(self):
+        for inline in OrderEditView.inlines:
+            inline._form_classes.clear()
+            inline._formset_classes.clear()
+        warmup()
+        for inline in OrderEditView.inlines:
+            self.assertEqual(list(inline._formset_classes),
+                [(Order, inline.get_form_class(None, Order()))])
+
+
+class SearchIndexCheckTest(SimpleTestCase):
+    """ W003 asks for trigram indexes only where there are any """
+
+    def search_warnings(self):
+        return [error for error in check_viewsets()
+            if error.id == "viewsets.W003"]
+
+    def test_postgres_only(self):
+        with mock.patch.object(connection, "vendor", "sqlite"):
+            self.assertEqual(self.search_warnings(), [])
+        with mock.patch.object(connection, "vendor", "postgresql"):
+            self.assertEqual(len(self.search_warnings()), 4)
@@ -0,0 +1,51 @@
+from django.db.models import Count
+
+from viewsets.columns import AnnotatedColumn
+from viewsets.inline import GenericInline, Inline, ModelFormWithInlinesView
+from viewsets.views import ViewSet
+
+from .models import Customer, Note, Order, OrderLine
+
+
+def order_count(customers):
+    return dict(Order.objects
+        .filter(customer__in=customers)
+        .values_list("customer")
+        .annotate(Count("pk"))
+        .order_by())
+order_count.batch = True
+order_count.short_description = "Orders"
+
+
+class CustomerViewSet(ViewSet):
+    model = Customer
+    list_display = ["__str__", "email", "region", "active", order_count]
+    list_filter = ["active"]
+    list_select_related = ["region"]
+    search_fields = ["name", "email"]
+    autocomplete = True
+
+
+class OrderViewSet(ViewSet):
+    model = Order
+    list_display = ["__str__", "customer", "customer__region", "status",
+        "total", AnnotatedColumn("line_count", Count("orderline"), "Lines")]
+    list_filter = ["status", "urgent"]
+    list_select_related = ["customer__region"]
+    search_fields = ["customer__name", "customer__email"]
+    actions = ["delete_selected", "update_selected"]
+    bulk_update_fields = ["status", "urgent"]
+
+
+customers = CustomerViewSet()
+orders = OrderViewSet()
+
+
+@orders.instance_view("edit")
+class OrderEditView(ModelFormWithInlinesView):
+    template_name = "shop/edit.html"
+    fields = ["customer", "status", "total", "urgent"]
+    inlines = [
+        Inline(OrderLine, fields="__all__"),
+        GenericInline(Note, exclude=["content_type", "object_id"]),
+    ]
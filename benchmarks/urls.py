@@ -0,0 +1,6 @@
+from viewsets.views import ViewSet
+
+urlpatterns = ViewSet.all_urls(viewsets=[
+    "benchmarks.shop.viewsets.customers",
+    "benchmarks.shop.viewsets.orders",
+])
@@ -5,10 +5,12 @@ setup(
     version='0.1.36',
     author='John Leith',
     author_email='leith.john@gmail.com',
-    packages=find_packages(),
+    packages=find_packages(exclude=["benchmarks", "benchmarks.*"]),
     url='https://github.com/freakypie/django-viewgroups.git',
     description='Django admin like groups of CBVs',
 #     long_description=open('README.rst').read(),
+    # lazy module attributes (PEP 562) and contextvars
+    python_requires=">=3.7",
     install_requires=[
         "six"
     ],
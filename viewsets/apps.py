@@ -0,0 +1,8 @@
+from django.apps import AppConfig
+
+
+class ViewSetsConfig(AppConfig):
+    name = "viewsets"
+
+    def ready(self):
+        from . import checks  # noqa: registers the system checks
@@ -0,0 +1,148 @@
+"""
+query budgets for viewset views
+
+declare them per view name on a ViewSet:
+
+    query_budget = {"list": 5, "detail": 3}
+
+`settings.VIEWSETS_QUERY_BUDGETS` decides what happens when a request goes
+over: "raise" raises QueryBudgetExceeded, "log" logs a warning and anything
+false turns the counting off. it defaults to "log" when DEBUG is on.
+"""
+import logging
+import re
+from collections import Counter
+from functools import wraps
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.urls import reverse
+
+from .timing import get_timings, render_response, wrapping_connections
+
+logger = logging.getLogger("viewsets.budgets")
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def get_budget_mode():
+    return getattr(settings, "VIEWSETS_QUERY_BUDGETS",
+        "log" if settings.DEBUG else None)
+
+
+class QueryCounter(object):
+    """ a database execute_wrapper counting queries by sql shape """
+
+    def __init__(self):
+        self.count = 0
+        # sql is still parameterized, identical strings are the same shape
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        self.shapes[sql] += 1
+        return execute(sql, params, many, context)
+
+    def repeated(self, limit):
+        """ shapes run at least limit times, the usual sign of an N+1 """
+        return [(sql, count) for sql, count in self.shapes.most_common()
+                if count >= limit]
+
+
+def check_budget(viewset, name, counter, mode):
+    budget = viewset.query_budget.get(name)
+    repeated = counter.repeated(viewset.query_repeat_limit)
+
+    for sql, count in repeated:
+        logger.warning("%s:%s ran the same query %s times (N+1?): %s",
+            viewset.name, name, count, sql)
+
+    if budget is not None and counter.count > budget:
+        message = "%s:%s ran %s queries, its budget is %s" % (
+            viewset.name, name, counter.count, budget)
+        if repeated:
+            message += "; repeated: " + "; ".join(
+                "%sx %s" % (count, sql) for sql, count in repeated)
+        if mode == "raise":
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+
+def budgeted_view(viewset, name, view):
+    """ wraps a view function so its queries are held to the budget """
+
+    @wraps(view)
+    def inner(request, *args, **kwargs):
+        mode = get_budget_mode()
+        if not mode:
+            return view(request, *args, **kwargs)
+
+        counter = QueryCounter()
+        with wrapping_connections(counter):
+            response = render_response(
+                view(request, *args, **kwargs), get_timings(request))
+
+        check_budget(viewset, name, counter, mode)
+        return response
+
+    return inner
+
+
+class QueryBudgetTestMixin(object):
+    """
+    mix into a django TestCase to hold every registered ViewSet to its
+    budgets, log self.client in first if the views need a user. a view
+    that doesn't answer with a 2xx fails, a redirect to the login page or
+    a 404 runs too few queries to tell anything
+    """
+
+    def get_budget_url_kwargs(self, viewset, name, groups):
+        """ kwargs to reverse the view with, None skips it """
+        kwargs = {}
+        if "pk" in groups or "slug" in groups:
+            obj = viewset.model._default_manager.order_by("pk").first()
+            if obj is None:
+                return None
+            if "pk" in groups:
+                kwargs["pk"] = obj.pk
+            if "slug" in groups:
+                kwargs["slug"] = getattr(obj, "slug")
+        if set(groups) - set(kwargs):
+            return None
+        return kwargs
+
+    def assertQueryBudgets(self, viewsets=None):
+        from django.test.utils import override_settings
+
+        from .views import ViewSet
+
+        for viewset in viewsets or ViewSet.managers:
+            for name in viewset.query_budget:
+                if name not in viewset.views:
+                    raise ImproperlyConfigured(
+                        "%s.query_budget names %r, its views are %s" % (
+                            type(viewset).__name__, name,
+                            ", ".join(viewset.views)))
+
+                with self.subTest(viewset=viewset.name, view=name):
+                    view_class, url_regex, links = viewset.views[name]
+                    groups = re.compile(url_regex).groupindex
+                    kwargs = self.get_budget_url_kwargs(viewset, name, groups)
+                    if kwargs is None:
+                        self.skipTest("%s:%s needs a %s to reverse its url, "
+                            "there is none" % (viewset.name, name,
+                                viewset.model._meta.verbose_name))
+
+                    url = reverse("%s:%s" % (viewset.name, name),
+                        kwargs=kwargs)
+                    with override_settings(VIEWSETS_QUERY_BUDGETS="raise"):
+                        try:
+                            response = self.client.get(url)
+                        except QueryBudgetExceeded as ex:
+                            self.fail(str(ex))
+                    self.assertTrue(200 <= response.status_code < 300,
+                        "%s answered %s %s, its budget wasn't tested" % (
+                            url, response.status_code,
+                            response.get("Location", "")))
@@ -0,0 +1,166 @@
+"""
+caches the objects of detail, update and delete views
+
+    class OrderViewSet(ViewSet):
+        object_cache = 300                      # seconds, True for default
+        object_cache_select_related = ["customer"]
+        object_cache_dependencies = [Customer]
+
+saving or deleting an object drops its entries, saving or deleting any
+dependency drops every cached object of the model. queryset.update(),
+bulk_create() and bulk_update() send no signals, call invalidate_model()
+after them (update_selected and bulk saving inlines do). only GET and HEAD read
+from the cache, writes always load the object from the database. within
+a transaction entries are dropped again once it commits, a read before
+the commit would have cached the old row. the cache is shared by every user, don't use it on viewsets whose queryset
+depends on the request.
+"""
+import uuid
+from collections import defaultdict
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.exceptions import ValidationError
+from django.db import router, transaction
+from django.db.models.signals import post_delete, post_save
+
+KEY_PREFIX = "viewsets:object"
+
+# model -> models whose cached objects show it
+_dependents = defaultdict(set)
+# model -> slug fields its objects are cached by
+_slug_fields = defaultdict(set)
+# models whose objects are cached
+_tracked = set()
+
+
+def get_cache():
+    return caches[getattr(settings, "VIEWSETS_OBJECT_CACHE", "default")]
+
+
+def object_key(model, lookup, value):
+    return "%s:%s:%s:%s" % (KEY_PREFIX, model._meta.label_lower, lookup, value)
+
+
+def generation_key(model):
+    return "%s:%s:generation" % (KEY_PREFIX, model._meta.label_lower)
+
+
+def new_generation(model):
+    generation = uuid.uuid4().hex
+    get_cache().set(generation_key(model), generation, None)
+    return generation
+
+
+def invalidate(func, using):
+    """
+    runs func now and, within a transaction, again once it commits. a GET
+    between the write and the commit still reads the old row and caches it
+    """
+    func()
+    if transaction.get_connection(using).in_atomic_block:
+        transaction.on_commit(func, using=using)
+
+
+def invalidate_object(sender, instance, using=None, **kwargs):
+    keys = [object_key(sender, "pk", instance.pk)]
+    for slug_field in _slug_fields[sender]:
+        keys.append(object_key(sender, slug_field,
+            getattr(instance, slug_field, None)))
+    invalidate(lambda: get_cache().delete_many(keys),
+        using or router.db_for_write(sender))
+
+
+def invalidate_dependents(sender, using=None, **kwargs):
+    models = list(_dependents[sender])
+    if not models:
+        return
+
+    def drop():
+        for model in models:
+            new_generation(model)
+    invalidate(drop, using or router.db_for_write(sender))
+
+
+def invalidate_model(model, using=None):
+    """
+    drops every cached object of model and of the models depending on it,
+    for writes that skip the save signals
+    """
+    using = using or router.db_for_write(model)
+    if model in _tracked:
+        invalidate(lambda: new_generation(model), using)
+    invalidate_dependents(model, using=using)
+
+
+def track(model, dependencies=(), slug_field=None):
+    """ keeps the cached objects of model fresh """
+    _tracked.add(model)
+    if slug_field:
+        _slug_fields[model].add(slug_field)
+
+    uid = "viewsets.cache:%s" % model._meta.label_lower
+    post_save.connect(invalidate_object, sender=model, dispatch_uid=uid)
+    post_delete.connect(invalidate_object, sender=model, dispatch_uid=uid)
+
+    for dependency in dependencies:
+        if isinstance(dependency, str):
+            dependency = apps.get_model(dependency)
+        _dependents[dependency].add(model)
+        uid = "viewsets.cache.dependents:%s" % dependency._meta.label_lower
+        post_save.connect(invalidate_dependents, sender=dependency,
+            dispatch_uid=uid)
+        post_delete.connect(invalidate_dependents, sender=dependency,
+            dispatch_uid=uid)
+
+
+class ObjectCacheMixin(object):
+    """ serves get_object from the cache when the ViewSet enables it """
+
+    def get_object(self, queryset=None):
+        manager = getattr(self, "manager", None)
+        if queryset is not None or \
+                not getattr(manager, "object_cache", False) or \
+                self.request.method not in ("GET", "HEAD"):
+            return super(ObjectCacheMixin, self).get_object(queryset)
+
+        pk = self.kwargs.get(self.pk_url_kwarg)
+        slug = self.kwargs.get(self.slug_url_kwarg)
+        if pk is not None:
+            # "012" and "12" are the same object, invalidate_object uses the
+            # instance's pk
+            try:
+                lookup, value = "pk", self.model._meta.pk.to_python(pk)
+            except ValidationError:
+                return super(ObjectCacheMixin, self).get_object(queryset)
+        elif slug is not None:
+            lookup, value = self.get_slug_field(), slug
+        else:
+            return super(ObjectCacheMixin, self).get_object(queryset)
+
+        cache = get_cache()
+        key, gen_key = object_key(self.model, lookup, value), \
+            generation_key(self.model)
+        found = cache.get_many([key, gen_key])
+
+        generation = found.get(gen_key)
+        if generation is None:
+            generation = new_generation(self.model)
+        elif key in found and found[key][0] == generation:
+            return found[key][1]
+
+        queryset = self.get_queryset()
+        select_related = manager.object_cache_select_related
+        if select_related is True:
+            queryset = queryset.select_related()
+        elif select_related:
+            queryset = queryset.select_related(*select_related)
+
+        obj = super(ObjectCacheMixin, self).get_object(queryset)
+        timeout = manager.object_cache
+        if timeout is True:
+            timeout = DEFAULT_TIMEOUT
+        cache.set(key, (generation, obj), timeout)
+        return obj
@@ -0,0 +1,243 @@
+"""
+system checks for the lists of every registered ViewSet
+
+    viewsets.W001  a sortable column has no index
+    viewsets.W002  a list_filter field has no index
+    viewsets.W003  a search field has no trigram index (postgres only)
+    viewsets.W004  a relation column is fetched per row, no select_related
+    viewsets.W005  an autocomplete field's model has no autocomplete view
+"""
+from types import SimpleNamespace
+
+from django.core import checks
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connections, models, router
+
+from .columns import AnnotatedColumn
+
+INDEX_HINT = "Add db_index=True or a Meta.indexes entry leading with it, " \
+    "lists of large tables scan the whole table without one."
+SEARCH_HINT = "Searches use icontains, which only a trigram or full text " \
+    "index can serve (e.g. a GinIndex with gin_trgm_ops on postgres)."
+
+
+def resolve_path(model, path):
+    """
+    follows a `__` path, returns its last field and the model it's on or
+    (None, None) when it isn't a field path
+    """
+    field = None
+    for name in path.split("__"):
+        if field is not None:
+            if not field.is_relation or field.related_model is None:
+                # a lookup or transform, like __year
+                break
+            model = field.related_model
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return None, None
+    return field, model
+
+
+def is_indexed(field, model):
+    """ is field the leading column of an index or unique constraint """
+    if field.primary_key or field.unique or field.db_index:
+        return True
+    if field.many_to_many or field.one_to_many or field.one_to_one:
+        # joins through the related model's foreign key or primary key
+        return True
+
+    opts = model._meta
+    leading = set()
+    for index in opts.indexes:
+        leading.add(index.fields[0].lstrip("-"))
+    for constraint in opts.constraints:
+        if isinstance(constraint, models.UniqueConstraint):
+            leading.add(constraint.fields[0])
+    for fields in list(opts.unique_together) + list(opts.index_together):
+        leading.add(fields[0])
+    return field.name in leading
+
+
+def has_trigram_index(field, model):
+    """
+    is field covered by a trigram index, the only kind icontains can use:
+    a btree (db_index, unique) can't serve a leading wildcard
+    """
+    for index in model._meta.indexes:
+        opclasses = getattr(index, "opclasses", ()) or ()
+        for name, opclass in zip(index.fields, opclasses):
+            if name.lstrip("-") == field.name and "trgm" in opclass:
+                return True
+    return False
+
+
+def has_trigram_indexes(viewset):
+    """
+    can the list's database have trigram indexes, elsewhere nothing
+    serves icontains and W003 couldn't be silenced
+    """
+    using = viewset.get_read_using("list") or \
+        router.db_for_read(viewset.model)
+    return connections[using].vendor == "postgresql"
+
+
+def get_sort_fields(viewset):
+    from .mixins.sort import ModelTableField
+
+    view = SimpleNamespace(model=viewset.model, manager=viewset)
+    for column in getattr(viewset, "list_display", []):
+        if isinstance(column, AnnotatedColumn):
+            continue
+        if callable(column):
+            sort_field = getattr(column, "sort_field", None)
+        elif isinstance(column, str):
+            field = ModelTableField(view, column)
+            sort_field = field.sort() if field.valid() else None
+        else:
+            sort_field = None
+        if sort_field:
+            yield sort_field
+
+
+def get_filter_fields(viewset):
+    for list_filter in getattr(viewset, "list_filter", []):
+        if isinstance(list_filter, (tuple, list)):
+            list_filter = list_filter[0]
+        if isinstance(list_filter, models.Field):
+            list_filter = list_filter.name
+        if isinstance(list_filter, str):
+            yield list_filter
+
+
+def get_select_related(viewset):
+    """ the select_related of the list queryset, True for everything """
+    select_related = viewset.list_select_related
+    if select_related is True:
+        return True
+
+    related = {}
+    try:
+        queryset = viewset.get_queryset(None, None)
+    except Exception:
+        # depends on the request, it can't be inspected here
+        queryset = None
+    if queryset is not None:
+        if queryset.query.select_related is True:
+            return True
+        related.update(queryset.query.select_related or {})
+
+    for path in select_related or ():
+        node = related
+        for name in path.split("__"):
+            node = node.setdefault(name, {})
+    return related
+
+
+def check_relation_columns(viewset):
+    select_related = get_select_related(viewset)
+    if select_related is True:
+        return
+
+    for column in getattr(viewset, "list_display", []):
+        if not isinstance(column, str) or column == "__str__":
+            continue
+
+        # the foreign keys the column follows
+        model, path = viewset.model, []
+        for name in column.split("__"):
+            try:
+                field = model._meta.get_field(name)
+            except FieldDoesNotExist:
+                break
+            if not (field.many_to_one or field.one_to_one):
+                break
+            path.append(name)
+            model = field.related_model
+
+        node = select_related
+        for name in path:
+            if name not in node:
+                yield checks.Warning(
+                    "%s shows %r, which queries %s once per row." % (
+                        type(viewset).__name__, column, name),
+                    hint="Add %r to list_select_related." % "__".join(path),
+                    obj=type(viewset),
+                    id="viewsets.W004",
+                )
+                break
+            node = node[name]
+
+
+def check_autocomplete_fields(viewset, viewsets):
+    served = set(other.model for other in viewsets
+        if "autocomplete" in other.views)
+    for name in viewset.autocomplete_fields:
+        try:
+            field = viewset.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            continue
+        if not isinstance(field, models.ForeignKey) or \
+                field.related_model in served:
+            continue
+        yield checks.Warning(
+            "%s lists %r in autocomplete_fields, but no ViewSet of %s has "
+            "an autocomplete view." % (
+                type(viewset).__name__, name, field.related_model._meta.label),
+            hint="Set autocomplete = True on it, the field renders a <select> "
+                "of every %s until then." % field.related_model._meta.verbose_name,
+            obj=type(viewset),
+            id="viewsets.W005",
+        )
+
+
+def check_indexes(viewset, paths, kind, hint, check_id,
+                  indexed=is_indexed, missing="index"):
+    for path in paths:
+        field, model = resolve_path(viewset.model, path)
+        if field is None or indexed(field, model):
+            continue
+        yield checks.Warning(
+            "%s %s %r (%s.%s), which has no %s." % (
+                type(viewset).__name__, kind, path,
+                model._meta.label, field.name, missing),
+            hint=hint,
+            obj=type(viewset),
+            id=check_id,
+        )
+
+
+@checks.register("viewsets")
+def check_viewsets(app_configs=None, **kwargs):
+    from django.urls import get_resolver
+
+    from .views import ViewSet
+
+    try:
+        # viewsets loaded by dotted path are only built with the urlconf
+        get_resolver().url_patterns
+    except Exception:
+        # reported by django's own url checks
+        pass
+
+    errors = []
+    for viewset in ViewSet.managers:
+        if viewset.model is None:
+            continue
+        if app_configs is not None and \
+                viewset.model._meta.app_config not in app_configs:
+            continue
+
+        errors.extend(check_indexes(viewset, get_sort_fields(viewset),
+            "sorts on", INDEX_HINT, "viewsets.W001"))
+        errors.extend(check_indexes(viewset, get_filter_fields(viewset),
+            "filters on", INDEX_HINT, "viewsets.W002"))
+        if has_trigram_indexes(viewset):
+            errors.extend(check_indexes(viewset,
+                getattr(viewset, "search_fields", []),
+                "searches", SEARCH_HINT, "viewsets.W003",
+                indexed=has_trigram_index, missing="trigram index"))
+        errors.extend(check_relation_columns(viewset))
+        errors.extend(check_autocomplete_fields(viewset, ViewSet.managers))
+    return errors
@@ -0,0 +1,24 @@
+"""
+list_display columns that aren't computed one row at a time
+"""
+
+
+class AnnotatedColumn(object):
+    """
+    a column computed by the database, the expression is added to the list
+    queryset as an annotation so the whole page costs one query and the
+    column can be sorted on
+
+        list_display = ["__str__", AnnotatedColumn("lines", Count("orderline"))]
+    """
+
+    def __init__(self, name, expression, short_description=None,
+            sortable=True):
+        self.name = name
+        self.expression = expression
+        self.short_description = short_description or \
+            name.replace("_", " ").title()
+        self.sort_field = name if sortable else None
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,69 @@
+"""
+what deleting a queryset would take with it, counted with aggregate
+queries instead of collecting the objects like django's Collector does
+"""
+from collections import OrderedDict
+
+from django.db.models import CASCADE, PROTECT, QuerySet
+from django.db.models.deletion import get_candidate_relations_to_delete
+
+
+def related_querysets(queryset):
+    """
+    yields (queryset, on_delete) of the rows pointing at the queryset,
+    its reverse foreign keys (m2m through rows included) and generic
+    relations
+    """
+    model = queryset.model
+    for related in get_candidate_relations_to_delete(model._meta):
+        field = related.field
+        parents = queryset.values(field.target_field.attname)
+        yield related.related_model._base_manager.filter(
+            **{"%s__in" % field.name: parents}), field.remote_field.on_delete
+
+    for field in model._meta.private_fields:
+        if not hasattr(field, "bulk_related_objects"):
+            continue
+        # generic relations, their objects go with the object
+        from django.contrib.contenttypes.models import ContentType
+        content_type = ContentType.objects.db_manager(queryset.db) \
+            .get_for_model(model, for_concrete_model=field.for_concrete_model)
+        yield field.remote_field.model._base_manager.filter(**{
+            field.content_type_field_name: content_type,
+            "%s__in" % field.object_id_field_name: queryset.values("pk"),
+        }), CASCADE
+
+
+def cascade_summary(queryset, max_depth=4):
+    """
+    returns (deleted, protected), lists of {"opts", "count"} per model of
+    the rows deleting the queryset cascades to and the rows protecting it.
+    relations deeper than max_depth aren't followed. queryset can also be
+    an iterable of querysets, chunks of the rows, their counts are added up
+    """
+    deleted, protected = OrderedDict(), OrderedDict()
+
+    def collect(queryset, depth):
+        if depth > max_depth:
+            return
+        for related, on_delete in related_querysets(queryset):
+            if on_delete not in (CASCADE, PROTECT):
+                # SET_NULL, SET_DEFAULT and DO_NOTHING don't delete
+                continue
+            count = related.count()
+            if not count:
+                continue
+            counts = deleted if on_delete is CASCADE else protected
+            opts = related.model._meta
+            counts[opts] = counts.get(opts, 0) + count
+            if on_delete is CASCADE:
+                collect(related, depth + 1)
+
+    if isinstance(queryset, QuerySet):
+        queryset = [queryset]
+    for chunk in queryset:
+        collect(chunk.order_by(), 1)
+    return (
+        [{"opts": opts, "count": count} for opts, count in deleted.items()],
+        [{"opts": opts, "count": count} for opts, count in protected.items()],
+    )
@@ -0,0 +1,169 @@
+"""
+runs an action over a queryset in chunks of consecutive pks, each chunk in
+its own transaction, so locks are held for one chunk at a time and a failing
+chunk only rolls itself back
+
+that only holds outside of a transaction: within one (ATOMIC_REQUESTS, an
+atomic block around the call) each chunk is a savepoint and every lock is
+kept until the outer transaction ends. running with lock there raises
+TransactionManagementError, without it a warning is logged. exempt the
+view with django.db.transaction.non_atomic_requests
+"""
+import logging
+from collections import namedtuple
+
+from django.db import connections, transaction
+from django.db.transaction import TransactionManagementError
+from django.utils.encoding import force_text
+
+logger = logging.getLogger("viewsets.actions")
+
+
+class ChunkResult(namedtuple("ChunkResult",
+                             "first last count skipped result error")):
+    """ what one chunk did, error is None when it was committed """
+
+    def as_dict(self):
+        result = self.result
+        if not isinstance(result, (int, float, bool, type(None))):
+            result = force_text(result)
+        return {
+            "first": self.first,
+            "last": self.last,
+            "count": self.count,
+            "skipped": self.skipped,
+            "result": result,
+            "error": self.error,
+        }
+
+
+class ExecutionSummary(object):
+    """ the chunks an action ran in and their totals """
+
+    def __init__(self, action=None):
+        self.action = action
+        self.chunks = []
+
+    @property
+    def committed(self):
+        return [chunk for chunk in self.chunks if chunk.error is None]
+
+    @property
+    def failed(self):
+        return [chunk for chunk in self.chunks if chunk.error is not None]
+
+    @property
+    def count(self):
+        """ rows in the committed chunks """
+        return sum(chunk.count for chunk in self.committed)
+
+    @property
+    def skipped(self):
+        """ rows left alone because another worker had them locked """
+        return sum(chunk.skipped for chunk in self.committed)
+
+    @property
+    def changed(self):
+        """ the sum of the committed chunks' counts returned by the action """
+        results = [chunk.result for chunk in self.committed
+                   if isinstance(chunk.result, int) and
+                   not isinstance(chunk.result, bool)]
+        return sum(results) if results else None
+
+    def as_dict(self):
+        return {
+            "action": self.action,
+            "count": self.count,
+            "skipped": self.skipped,
+            "changed": self.changed,
+            "failed": len(self.failed),
+            "chunks": [chunk.as_dict() for chunk in self.chunks],
+        }
+
+
+class ChunkedExecutor(object):
+    """
+    calls func(chunk) with querysets of at most chunk_size rows of the
+    queryset, walking it by pk. with lock the chunk's rows are locked with
+    select_for_update(skip_locked=True) first and the ones another
+    transaction holds are skipped, so several workers can run the same
+    action side by side
+
+    with a selection its chunks are walked instead, each narrowing the
+    queryset to at most chunk_size of the stored pks
+    """
+
+    def __init__(self, queryset, chunk_size=500, lock=False,
+                 stop_on_error=False, action=None, selection=None):
+        self.queryset = queryset
+        self.chunk_size = chunk_size
+        self.lock = lock
+        self.stop_on_error = stop_on_error
+        self.action = action
+        self.selection = selection
+
+    def pk_ranges(self):
+        """ yields (first, last, count) of consecutive runs of chunk_size pks """
+        pks = self.queryset.order_by("pk").values_list("pk", flat=True)
+        last = None
+        while True:
+            page = pks if last is None else pks.filter(pk__gt=last)
+            page = list(page[:self.chunk_size])
+            if not page:
+                return
+            yield page[0], page[-1], len(page)
+            last = page[-1]
+
+    def get_chunks(self):
+        """ yields (first, last, count, queryset) of every chunk """
+        if self.selection is not None:
+            for pks, chunk in self.selection.querysets(
+                    self.queryset, self.chunk_size):
+                yield pks[0], pks[-1], len(pks), chunk
+            return
+        for first, last, count in self.pk_ranges():
+            yield first, last, count, \
+                self.queryset.filter(pk__gte=first, pk__lte=last)
+
+    def get_lock_kwargs(self):
+        kwargs = {"skip_locked": True}
+        # only the action's own rows, not the ones its filters joined
+        if connections[self.queryset.db].features.has_select_for_update_of:
+            kwargs["of"] = ("self",)
+        return kwargs
+
+    def run_chunk(self, func, first, last, count, chunk):
+        skipped = 0
+        with transaction.atomic(using=self.queryset.db):
+            if self.lock:
+                pks = list(chunk.select_for_update(**self.get_lock_kwargs())
+                           .values_list("pk", flat=True))
+                skipped = max(count - len(pks), 0)
+                count = len(pks)
+                chunk = self.queryset.filter(pk__in=pks)
+            result = func(chunk)
+        return ChunkResult(first, last, count, skipped, result, None)
+
+    def check_transaction(self):
+        if not connections[self.queryset.db].in_atomic_block:
+            return
+        message = "%s runs inside a transaction, its chunks are savepoints " \
+            "and hold their locks until it ends" % (self.action or "action")
+        if self.lock:
+            raise TransactionManagementError(message)
+        logger.warning(message)
+
+    def run(self, func):
+        self.check_transaction()
+        summary = ExecutionSummary(self.action)
+        for first, last, count, queryset in self.get_chunks():
+            try:
+                chunk = self.run_chunk(func, first, last, count, queryset)
+            except Exception as e:
+                logger.exception("%s failed on pks %s to %s",
+                                 self.action or func, first, last)
+                chunk = ChunkResult(first, last, count, 0, None, force_text(e))
+            summary.chunks.append(chunk)
+            if chunk.error is not None and self.stop_on_error:
+                break
+        return summary
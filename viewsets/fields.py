@@ -1,12 +1,144 @@
+import six
 from django import forms
+from django.core.exceptions import ValidationError
+from django.utils.encoding import force_text
+
 from .widgets import AutocompleteWidget
 
 
+class AutocompleteLabels(object):
+    """
+    collects the pks of autocomplete fields that need a label and
+    resolves all pending pks of a model with one query the first
+    time any of them is rendered
+    """
+
+    def __init__(self):
+        self.pending = {}
+        self.labels = {}
+
+    def key(self, field):
+        return (type(field), field.queryset.model, field.to_field_name)
+
+    def add(self, field, pk):
+        key = self.key(field)
+        if (key, pk) not in self.labels:
+            self.pending.setdefault(key, (field, set()))[1].add(pk)
+
+    def set(self, field, pk, label):
+        self.labels[(self.key(field), pk)] = label
+
+    def get(self, field, pk):
+        key = self.key(field)
+        if (key, pk) not in self.labels:
+            self.add(field, pk)
+            self.resolve(key)
+        return self.labels[(key, pk)]
+
+    def resolve(self, key):
+        field, pks = self.pending.pop(key, (None, ()))
+        if not pks:
+            return
+        for pk, label in field.resolve_labels(pks).items():
+            self.labels[(key, pk)] = label
+        for pk in pks:
+            self.labels.setdefault((key, pk), "")
+
+
+class AutocompleteValue(object):
+    """ a pk whose label is only looked up when it is rendered """
+
+    def __init__(self, field, pk):
+        self.field = field
+        self.pk = pk
+
+    @property
+    def label(self):
+        return self.field.labels.get(self.field, self.pk)
+
+    def __str__(self):
+        # compared against submitted data by has_changed
+        return six.text_type(self.pk)
+
+
 class AutocompleteField(forms.ModelChoiceField):
     widget = AutocompleteWidget
 
+    # when set, labels are read from this model field instead of
+    # calling label_from_instance on fully loaded instances
+    label_field = None
+
+    def __init__(self, queryset, label_field=None, **kwargs):
+        super(AutocompleteField, self).__init__(queryset, **kwargs)
+        if label_field:
+            self.label_field = label_field
+        self.labels = AutocompleteLabels()
+
+    def __deepcopy__(self, memo):
+        result = super(AutocompleteField, self).__deepcopy__(memo)
+        result.labels = AutocompleteLabels()
+        return result
+
+    def get_lookup_field(self):
+        return self.queryset.model._meta.get_field(
+            self.to_field_name or self.queryset.model._meta.pk.name)
+
+    def resolve_labels(self, pks):
+        """ returns {pk: label} for the given pks with a single query """
+        field_name = self.to_field_name or "pk"
+        queryset = self.queryset.order_by()
+        if self.label_field:
+            queryset = queryset.only(self.label_field)
+            objects = queryset.in_bulk(pks, field_name=field_name)
+            return dict(
+                (pk, force_text(getattr(obj, self.label_field)))
+                for pk, obj in objects.items())
+
+        objects = queryset.in_bulk(pks, field_name=field_name)
+        return dict(
+            (pk, self.label_from_instance(obj)) for pk, obj in objects.items())
+
     def prepare_value(self, value):
         if hasattr(value, '_meta'):
-            return value
-        if value:
-            return self.queryset.get(pk=value)
+            pk = value.serializable_value(self.to_field_name or "pk")
+            self.labels.set(self, pk, self.label_from_instance(value))
+            return AutocompleteValue(self, pk)
+        if value in self.empty_values:
+            return None
+        try:
+            pk = self.get_lookup_field().to_python(value)
+        except ValidationError:
+            return None
+        self.labels.add(self, pk)
+        return AutocompleteValue(self, pk)
+
+
+def share_autocomplete_labels(forms, labels=None):
+    """
+    points the autocomplete fields of the given forms at one label
+    cache and registers their current values, so every label is
+    fetched together when the first one renders
+    """
+    if labels is None:
+        labels = AutocompleteLabels()
+    for form in forms:
+        for name, field in form.fields.items():
+            if isinstance(field, AutocompleteField):
+                field.labels = labels
+                field.prepare_value(get_form_value(form, name, field))
+    return labels
+
+
+def get_form_value(form, name, field):
+    """
+    what BoundField.value() returns, without creating the bound field:
+    it would be cached with the form's current prefix, which inline
+    pages change after the forms are built
+    """
+    value = form.initial.get(name, field.initial)
+    if callable(value):
+        value = value()
+    if form.is_bound:
+        value = field.bound_data(field.widget.value_from_datadict(
+            form.data, form.files, form.add_prefix(name)), value)
+    return value
@@ -0,0 +1,44 @@
+from django import forms
+from django.core.exceptions import ValidationError
+from django.utils.text import capfirst
+from django.utils.translation import ugettext_lazy as _
+
+
+class BulkUpdateForm(forms.Form):
+    """
+    picks one of the whitelisted fields of a model and the value it's set
+    to, every field gets its own value input named value_<field>
+    """
+    field = forms.ChoiceField(label=_("Field"))
+
+    def __init__(self, model, fields, *args, **kwargs):
+        super(BulkUpdateForm, self).__init__(*args, **kwargs)
+        self.model = model
+        self.model_fields = [model._meta.get_field(name) for name in fields]
+
+        self.fields["field"].choices = [
+            (field.name, capfirst(field.verbose_name))
+            for field in self.model_fields]
+        for field in self.model_fields:
+            formfield = field.formfield()
+            formfield.required = False
+            self.fields["value_%s" % field.name] = formfield
+
+    def clean(self):
+        cleaned_data = super(BulkUpdateForm, self).clean()
+        name = cleaned_data.get("field")
+        if name:
+            value_name = "value_%s" % name
+            field = self.model._meta.get_field(name)
+            value = cleaned_data.get(value_name)
+            try:
+                if not field.is_relation:
+                    # the model field knows about null, blank and choices
+                    value = field.clean(value, None)
+                elif value is None and not field.null:
+                    raise ValidationError(
+                        field.error_messages["null"], code="null")
+                cleaned_data["value"] = value
+            except ValidationError as e:
+                self.add_error(value_name, e)
+        return cleaned_data
@@ -1,12 +1,84 @@
 # this is not complete ~ May 7th, 2013 JL
+import copy
+import functools
+
 from django.views.generic.edit import CreateView
 from django.forms.models import modelform_factory, inlineformset_factory, \
-    BaseInlineFormSet, ModelForm, _get_foreign_key, modelformset_factory
+    BaseInlineFormSet, ModelForm, _get_foreign_key, modelformset_factory, \
+    ModelChoiceField, ModelChoiceIterator
+from django.forms.widgets import ChoiceWidget
+from django.core.exceptions import ValidationError
+from django.http import Http404, HttpResponse
 from django.template.loader import render_to_string
 from django.contrib.contenttypes.forms import generic_inlineformset_factory
+from django.db import router, transaction
 from django.shortcuts import redirect
 from django.utils.translation import ugettext_lazy as _
 
+from .cache import invalidate_model
+from .fields import AutocompleteLabels, share_autocomplete_labels
+
+
+class SharedChoiceIterator(ModelChoiceIterator):
+    """
+    iterates the choices of one field of a formset, they're fetched when
+    the first form renders and kept in the formset's cache for the others
+    """
+
+    def __init__(self, field, cache, name):
+        super(SharedChoiceIterator, self).__init__(field)
+        self.cache = cache
+        self.name = name
+
+    def __iter__(self):
+        if self.name not in self.cache:
+            self.cache[self.name] = list(
+                super(SharedChoiceIterator, self).__iter__())
+        return iter(self.cache[self.name])
+
+    def __len__(self):
+        if self.name in self.cache:
+            return len(self.cache[self.name])
+        return super(SharedChoiceIterator, self).__len__()
+
+
+class SharedChoicesFormSetMixin(object):
+    """
+    evaluates the choices of each model choice field once per formset
+    and hands the same list to every form, including the empty form.
+    nothing is fetched until a form renders, bound forms validate with
+    queryset lookups and never iterate their choices
+
+    autocomplete fields share one label cache, so the labels of every
+    form are fetched with one query when the first form renders
+    """
+
+    def share_choices(self, form):
+        labels = self.__dict__.setdefault(
+            "_autocomplete_labels", AutocompleteLabels())
+        share_autocomplete_labels([form], labels)
+
+        cache = self.__dict__.setdefault("_shared_choices", {})
+        for name, field in form.fields.items():
+            # hidden and autocomplete widgets never render their choices
+            if not isinstance(field, ModelChoiceField) or \
+                    not isinstance(field.widget, ChoiceWidget):
+                continue
+            field.iterator = functools.partial(
+                SharedChoiceIterator, cache=cache, name=name)
+            field.widget.choices = field.choices
+        return form
+
+    def _construct_form(self, i, **kwargs):
+        form = super(SharedChoicesFormSetMixin, self)._construct_form(
+            i, **kwargs)
+        return self.share_choices(form)
+
+    @property
+    def empty_form(self):
+        return self.share_choices(
+            super(SharedChoicesFormSetMixin, self).empty_form)
+
 
 class Inline(object):
     model = None
@@ -14,15 +86,50 @@ class Inline(object):
     form_kwargs = {}
     form_class = None
     formset_class = None
+    exclude_names = []
+
+    # save new, changed and deleted rows in bulk instead of form by form.
+    # bulk saves skip Model.save()/delete() and the save signals, so the
+    # object cache of the inline's model (and its dependents) is dropped
+    # as a whole afterwards
+    bulk_save = False
+    bulk_batch_size = None
+
+    # evaluate choice querysets once per formset instead of once per form,
+    # turn off if a form narrows its choices per instance
+    share_choices = True
+
+    # keep the generated form and formset classes for the next requests.
+    # formset classes are kept per form class, turn off when
+    # get_form_class builds a new class per request or
+    # create_formset_class varies by request
+    cache_classes = True
+
+    # render at most this many existing children, further pages are
+    # fetched with ajax by add_more_inlines.js
+    paginate_by = None
+    page_template = "forms/inline_page.html"
+    page = 1
+    has_more = False
+
+    # per request state, only set on copies returned by bind()
+    request = None
+    instance = None
+    formset = None
 
     def __init__(
         self, model, form=None, formset_class=None,
-        template="forms/inline.html", **kwargs
+        template="forms/inline.html", bulk_save=None, paginate_by=None,
+        **kwargs
     ):
 
         self.model = model
         self.opts = self.model._meta
         self.template = template
+        if bulk_save is not None:
+            self.bulk_save = bulk_save
+        if paginate_by is not None:
+            self.paginate_by = paginate_by
 
         self.form_class = form
         self.formset_class = formset_class
@@ -30,45 +137,170 @@ class Inline(object):
         self.formset_kwargs = self.formset_kwargs.copy()
         self.formset_kwargs.update(kwargs)
 
+        # generated classes, keyed by parent model (and exclude set for forms)
+        self._form_classes = {}
+        self._formset_classes = {}
+
     def get_form_class(self, request, instance=None, **kwargs):
+        """
+        returns the form class for this inline
+
+        classes are built once per (parent model, exclude set)
+        and reused for every request after that
+        """
+        if instance is None:
+            instance = getattr(self, "instance", None)
+        parent_model = type(instance)
+
         kwargs.update(self.form_kwargs)
-        if "exclude" in self.formset_kwargs:
-            kwargs['exclude'] = kwargs.get("exclude", []) \
-                + self.formset_kwargs.get("exclude")
+        exclude = list(kwargs.get("exclude") or []) + \
+            list(self.formset_kwargs.get("exclude") or [])
 
         try:
-            fk = _get_foreign_key(type(self.instance), self.model)
-            kwargs['exclude'] = kwargs.get("exclude", []) + [fk.name]
-        except:
+            fk = _get_foreign_key(parent_model, self.model)
+            exclude.append(fk.name)
+        except Exception:
             pass
 
-        return modelform_factory(self.model, form=self.form_class or ModelForm,
-            **kwargs)
+        key = (parent_model, frozenset(exclude))
+        form_class = self._form_classes.get(key)
+        if form_class is None:
+            if exclude:
+                kwargs['exclude'] = exclude
+            form_class = modelform_factory(self.model,
+                form=self.form_class or ModelForm, **kwargs)
+            if self.cache_classes:
+                self._form_classes[key] = form_class
+        return form_class
 
     def get_headers(self):
-        form = self.get_form_class(self.request, self.instance)()
-
-        for field in form.visible_fields():
-            name = field.name.replace("_", " ").title()
-            yield _(name)
+        """ lists visible field names without building a form instance """
+        form_class = self.get_form_class(self.request, self.instance,
+            exclude=self.exclude_names)
+
+        for name, field in form_class.base_fields.items():
+            if not field.widget.is_hidden:
+                yield _(name.replace("_", " ").title())
+
+    def bind(self, request, instance):
+        """
+        returns a copy of this inline for a single request
+
+        inlines are configured once on the view class and shared by
+        every thread, so per request state only ever goes on the copy
+        """
+        inline = copy.copy(self)
+        inline.request = request
+        inline.instance = instance
+        return inline
 
     def prepare(self, request, instance):
-        self.request = request
-        self.instance = instance
+        """ returns a bound copy of this inline with its formset built """
+        inline = self.bind(request, instance)
 
         args = []
         if request.method == "POST":
             args.append(request.POST)
             args.append(request.FILES)
 
-        formset_class = self.create_formset_class(instance)
+        formset_class = inline.get_formset_class(instance)
+
+        inline.create_formset(args, instance, formset_class)
 
-        self.create_formset(args, instance, formset_class)
+        return inline
 
-        return self
+    def get_formset_class(self, instance):
+        """
+        returns the (cached) formset class for the instance's model and
+        the form class get_form_class picks for this request
+        """
+        key = (type(instance), self.get_form_class(self.request, instance))
+        formset_class = self._formset_classes.get(key)
+        if formset_class is None:
+            formset_class = self.create_formset_class(instance)
+            if self.share_choices:
+                formset_class = type(formset_class.__name__,
+                    (SharedChoicesFormSetMixin, formset_class), {})
+            if self.cache_classes:
+                self._formset_classes[key] = formset_class
+        return formset_class
 
     def create_formset(self, args, instance, formset_class):
-        self.formset = formset_class(*args, instance=instance)
+        kwargs = {}
+        if self.paginate_by and instance.pk is not None:
+            if args:
+                kwargs['queryset'] = self.get_submitted_queryset(
+                    args[0], instance, formset_class)
+            else:
+                kwargs['queryset'] = self.get_page_queryset(
+                    1, instance, formset_class)
+        self.formset = formset_class(*args, instance=instance, **kwargs)
+
+    def get_queryset(self, instance, formset_class):
+        """ returns every existing child of the instance, in formset order """
+        return formset_class(instance=instance).get_queryset()
+
+    def get_page_queryset(self, page, instance, formset_class):
+        """ returns the children shown on the given page """
+        queryset = self.get_queryset(instance, formset_class)
+        start = (page - 1) * self.paginate_by
+        pks = list(queryset.values_list("pk", flat=True)[
+            start:start + self.paginate_by + 1])
+
+        self.page = page
+        self.has_more = len(pks) > self.paginate_by
+        return queryset.filter(pk__in=pks[:self.paginate_by])
+
+    def get_submitted_queryset(self, data, instance, formset_class):
+        """
+        returns only the children whose forms were posted,
+        the rest of them are left alone
+        """
+        prefix = formset_class.get_default_prefix()
+        try:
+            initial = int(data.get("%s-INITIAL_FORMS" % prefix, 0))
+        except ValueError:
+            initial = 0
+        initial = min(initial, getattr(formset_class, "absolute_max", initial))
+
+        pk_field = self.opts.pk
+        pks = []
+        for index in range(initial):
+            value = data.get("%s-%s-%s" % (prefix, index, pk_field.name))
+            try:
+                value = pk_field.to_python(value)
+            except ValidationError:
+                continue
+            if value is not None:
+                pks.append(value)
+
+        # the pages that were loaded, so an invalid post re-renders with
+        # its "Load more" button when children are left
+        queryset = self.get_queryset(instance, formset_class)
+        self.page = max(1, -(-len(pks) // self.paginate_by))
+        self.has_more = queryset.exclude(pk__in=pks).exists()
+        return queryset.filter(pk__in=pks)
+
+    def render_page(self, request, instance, page, offset):
+        """
+        renders one page of existing children as forms numbered
+        from offset, to be appended to the already rendered formset
+        """
+        formset_class = self.get_formset_class(instance)
+        queryset = self.get_page_queryset(page, instance, formset_class)
+        formset = formset_class(instance=instance, queryset=queryset)
+        formset.extra = 0
+        formset.min_num = 0
+
+        forms = formset.initial_forms
+        for index, form in enumerate(forms):
+            form.prefix = formset.add_prefix(offset + index)
+
+        return render_to_string(self.page_template, {
+            "forms": forms,
+            "formset": formset,
+            "inline": self,
+        }, request=request)
 
     def create_formset_class(self, instance):
         return inlineformset_factory(type(instance), self.model,
@@ -76,6 +308,77 @@ class Inline(object):
             form=self.get_form_class(self.request, instance),
             **self.formset_kwargs)
 
+    def save(self):
+        """ saves the (valid) formset, returns the saved objects """
+        if self.bulk_save:
+            return self.save_bulk(self.formset)
+        return self.formset.save()
+
+    def save_bulk(self, formset):
+        """
+        saves a valid formset with one bulk_create for new rows,
+        one bulk_update (on the changed fields only) for changed rows
+        and one filtered delete for deleted rows
+        """
+        manager = self.model._default_manager
+        concrete = dict(
+            (f.name, f) for f in self.opts.concrete_fields if not f.primary_key)
+        many_to_many = set(f.name for f in self.opts.many_to_many)
+
+        formset.new_objects = []
+        formset.changed_objects = []
+        formset.deleted_objects = []
+
+        deleted = []
+        changed = []
+        changed_fields = set()
+        save_m2m = []
+
+        for form in formset.initial_forms:
+            obj = form.instance
+            if formset.can_delete and formset._should_delete_form(form):
+                if obj.pk is not None:
+                    deleted.append(obj)
+            elif form.has_changed():
+                obj = formset.save_existing(form, obj, commit=False)
+                changed.append(obj)
+                changed_fields.update(
+                    name for name in form.changed_data if name in concrete)
+                formset.changed_objects.append((obj, form.changed_data))
+                save_m2m.append(form)
+
+        new = []
+        for form in formset.extra_forms:
+            if not form.has_changed():
+                continue
+            if formset.can_delete and formset._should_delete_form(form):
+                continue
+            if many_to_many.intersection(form.changed_data):
+                # related rows need a pk, which bulk_create may not return
+                obj = formset.save_new(form, commit=True)
+            else:
+                obj = formset.save_new(form, commit=False)
+                new.append(obj)
+            formset.new_objects.append(obj)
+
+        if deleted:
+            manager.filter(pk__in=[obj.pk for obj in deleted]).delete()
+            formset.deleted_objects = deleted
+        if changed and changed_fields:
+            manager.bulk_update(changed, list(changed_fields),
+                batch_size=self.bulk_batch_size)
+        if new:
+            manager.bulk_create(new, batch_size=self.bulk_batch_size)
+
+        for form in save_m2m:
+            form.save_m2m()
+
+        if changed or new:
+            invalidate_model(self.model)
+
+        return formset.new_objects + \
+            [obj for obj, fields in formset.changed_objects]
+
     def __unicode__(self):
         return render_to_string(
             self.template,
@@ -95,14 +398,6 @@ class GenericInline(Inline):
             form=self.get_form_class(self.request, instance),
             **self.formset_kwargs)
 
-    def get_headers(self):
-        form = self.get_form_class(self.request, self.instance,
-            exclude=self.exclude_names)()
-
-        for field in form.visible_fields():
-            name = field.name.replace("_", " ").title()
-            yield _(name)
-
 
 class FormsetInline(Inline):
     exclude_names = []
@@ -112,14 +407,6 @@ class FormsetInline(Inline):
             form=self.get_form_class(self.request, instance),
             **self.formset_kwargs)
 
-    def get_headers(self):
-        form = self.get_form_class(self.request, self.instance,
-            exclude=self.exclude_names)()
-
-        for field in form.visible_fields():
-            name = field.name.replace("_", " ").title()
-            yield _(name)
-
     def create_formset(self, args, instance, formset_class):
         self.formset = formset_class(*args, queryset=self.model.objects.none())
 
@@ -132,10 +419,38 @@ class ModelFormWithInlinesView(CreateView):
     """
     inlines = []
     fields = '__all__'
+    inline_kwarg = "inline"
+    inline_page_kwarg = "inline_page"
+    inline_offset_kwarg = "inline_offset"
 
     def get_inlines(self):
         return self.inlines
 
+    def render_inline_page(self, prefix):
+        """ renders a further page of a paginated inline for ajax """
+        try:
+            page = int(self.request.GET.get(self.inline_page_kwarg, 1))
+            offset = int(self.request.GET.get(self.inline_offset_kwarg, 0))
+        except ValueError:
+            raise Http404(_("Page and offset must be integers."))
+        if page < 1 or offset < 0:
+            raise Http404(_("Invalid page."))
+
+        for inline in self.get_inlines():
+            if not inline.paginate_by:
+                continue
+            formset_class = inline.get_formset_class(self.object)
+            if formset_class.get_default_prefix() == prefix:
+                inline = inline.bind(self.request, self.object)
+                break
+        else:
+            raise Http404(_("No paginated inline named %s.") % prefix)
+
+        response = HttpResponse(
+            inline.render_page(self.request, self.object, page, offset))
+        response["X-Inline-Next-Page"] = inline.has_more and str(page + 1) or ""
+        return response
+
     def new_object(self):
         return self.get_queryset().model()
 
@@ -149,11 +464,14 @@ class ModelFormWithInlinesView(CreateView):
         self.object = self.get_object()
         self.created = self.object.id is None
 
+        if request.is_ajax() and self.inline_kwarg in request.GET:
+            return self.render_inline_page(request.GET[self.inline_kwarg])
+
         form_class = self.get_form_class()
         form = self.get_form(form_class)
 
-        inlines = self.get_inlines()
-        [k.prepare(self.request, self.object) for k in inlines]
+        inlines = [k.prepare(self.request, self.object)
+            for k in self.get_inlines()]
 
         return self.render_to_response(self.get_context_data(
             form=form,
@@ -167,8 +485,8 @@ class ModelFormWithInlinesView(CreateView):
         form_class = self.get_form_class()
         form = self.get_form(form_class)
 
-        inlines = self.get_inlines()
-        [k.prepare(self.request, self.object) for k in inlines]
+        inlines = [k.prepare(self.request, self.object)
+            for k in self.get_inlines()]
 
         valid = form.is_valid()
         for inline in inlines:
@@ -182,12 +500,15 @@ class ModelFormWithInlinesView(CreateView):
 
     def form_valid(self, form, inlines):
 
-        self.object = form.save()
-        if hasattr(form, "save_m2m"):
-            form.save_m2m()
+        # the parent and all of its inlines are saved or none of them are
+        with transaction.atomic(
+                using=router.db_for_write(type(self.object))):
+            self.object = form.save()
+            if hasattr(form, "save_m2m"):
+                form.save_m2m()
 
-        for inline in inlines:
-            inline.formset.save()
+            for inline in inlines:
+                inline.save()
 
         return redirect(self.get_success_url())
 
@@ -0,0 +1,102 @@
+import cProfile
+import io
+import pstats
+import time
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import NoReverseMatch, reverse
+
+from viewsets.budgets import QueryCounter
+from viewsets.timing import wrapping_connections
+
+
+class Command(BaseCommand):
+    help = "profiles a viewset view with synthetic requests"
+
+    def add_arguments(self, parser):
+        parser.add_argument("view",
+            help="url name of the view, e.g. orders:list")
+        parser.add_argument("--pk", help="object pk for instance views")
+        parser.add_argument("--query", default="",
+            help="query string to send, e.g. 'q=smith&o=2'")
+        parser.add_argument("--requests", type=int, default=10)
+        parser.add_argument("--user", help="username to log in as")
+        parser.add_argument("--limit", type=int, default=20,
+            help="number of hot functions and allocation sites to show")
+        parser.add_argument("--sort", default="cumulative",
+            help="pstats sort key")
+
+    def get_url(self, options):
+        kwargs = {"pk": options["pk"]} if options["pk"] else {}
+        try:
+            url = reverse(options["view"], kwargs=kwargs)
+        except NoReverseMatch as ex:
+            raise CommandError(ex)
+        if options["query"]:
+            url += "?" + options["query"]
+        return url
+
+    def get_client(self, options):
+        client = Client()
+        if options["user"]:
+            User = get_user_model()
+            try:
+                user = User._default_manager.get_by_natural_key(options["user"])
+            except User.DoesNotExist:
+                raise CommandError("no user %s" % options["user"])
+            client.force_login(user)
+        return client
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        try:
+            self.profile(options)
+        finally:
+            teardown_test_environment()
+
+    def profile(self, options):
+        url = self.get_url(options)
+        client = self.get_client(options)
+        count = options["requests"]
+
+        # the first request pays for imports, templates and caches
+        response = client.get(url)
+        if response.status_code >= 400:
+            raise CommandError("%s returned %s" % (url, response.status_code))
+
+        counter = QueryCounter()
+        profiler = cProfile.Profile()
+        tracemalloc.start()
+        started = time.perf_counter()
+        with wrapping_connections(counter):
+            profiler.enable()
+            for i in range(count):
+                client.get(url)
+            profiler.disable()
+        elapsed = time.perf_counter() - started
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+
+        write = self.stdout.write
+        write("%s x%s: %.1fms per request, %.1f queries per request" % (
+            url, count, elapsed * 1000 / count, counter.count / float(count)))
+        write("allocation peak: %.1fKiB" % (peak / 1024.0))
+
+        write("\nrepeated queries:")
+        for sql, repeats in counter.repeated(count * 2):
+            write("  %sx %s" % (repeats // count, sql))
+
+        write("\nhot functions:")
+        stream = io.StringIO()
+        stats = pstats.Stats(profiler, stream=stream)
+        stats.strip_dirs().sort_stats(options["sort"]).print_stats(options["limit"])
+        write(stream.getvalue())
+
+        write("allocations:")
+        for stat in snapshot.statistics("lineno")[:options["limit"]]:
+            write("  %s" % stat)
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from viewsets.warmup import warmup
+
+
+class Command(BaseCommand):
+    help = "builds viewset urls, templates and caches ahead of requests"
+
+    def handle(self, *args, **options):
+        log = self.stdout.write if options["verbosity"] > 0 else None
+        warmup(log=log)
@@ -0,0 +1,210 @@
+"""
+aggregated request metrics per (viewset, view) in prometheus text format
+
+turn it on with `metrics = True` on a ViewSet and mount the endpoint with
+`ViewSet.all_urls(metrics_url=r'^metrics/$')`.
+
+with pre-forked workers set settings.VIEWSETS_METRICS_DIR to a directory
+shared by all of them, each process then writes its own totals to
+<pid>.json in there and the endpoint adds up every file
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.http import HttpResponse
+
+from .timing import recording, render_response
+
+DURATION_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+COUNTERS = {
+    "viewsets_requests_total": "Requests handled by viewset views.",
+}
+
+HISTOGRAMS = {
+    "viewsets_request_duration_seconds": (
+        "Time spent in viewset views, including rendering.",
+        DURATION_BUCKETS),
+    "viewsets_request_queries": (
+        "Database queries per viewset view request.", QUERY_BUCKETS),
+    "viewsets_action_duration_seconds": (
+        "Time spent executing list actions.", DURATION_BUCKETS),
+}
+
+
+class MetricsRegistry(object):
+    """ thread safe counters and histograms keyed by metric and labels """
+
+    def __init__(self, directory=None, flush_interval=1.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.flushed = 0
+
+    def inc(self, name, labels, value=1):
+        key = (name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+        self.flush()
+
+    def observe(self, name, labels, value):
+        buckets = HISTOGRAMS[name][1]
+        key = (name, labels)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [0] * len(buckets) + [0, 0]
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    histogram[index] += 1
+            histogram[-2] += value
+            histogram[-1] += 1
+        self.flush()
+
+    def snapshot(self):
+        with self.lock:
+            return (
+                dict(self.counters),
+                dict((key, list(value))
+                    for key, value in self.histograms.items()))
+
+    def flush(self, force=False):
+        """ writes this process' totals to the shared directory """
+        if not self.directory:
+            return
+        now = time.time()
+        if not force and now - self.flushed < self.flush_interval:
+            return
+        self.flushed = now
+
+        counters, histograms = self.snapshot()
+        data = {
+            "counters": [[n, l, v] for (n, l), v in counters.items()],
+            "histograms": [[n, l, v] for (n, l), v in histograms.items()],
+        }
+        path = os.path.join(self.directory, "%s.json" % os.getpid())
+        handle, temp_path = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(handle, "w") as temp_file:
+            json.dump(data, temp_file)
+        os.replace(temp_path, path)
+
+    def collect(self):
+        """ returns (counters, histograms) of every process """
+        if not self.directory:
+            return self.snapshot()
+
+        self.flush(force=True)
+        counters, histograms = {}, {}
+        for filename in os.listdir(self.directory):
+            if not filename.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, filename)) as data_file:
+                    data = json.load(data_file)
+            except (IOError, ValueError):
+                continue
+
+            for name, labels, value in data["counters"]:
+                key = (name, tuple(tuple(label) for label in labels))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, value in data["histograms"]:
+                key = (name, tuple(tuple(label) for label in labels))
+                if key in histograms:
+                    value = [a + b for a, b in zip(histograms[key], value)]
+                histograms[key] = value
+        return counters, histograms
+
+    def render(self):
+        """ formats everything in the prometheus text exposition format """
+        counters, histograms = self.collect()
+        lines = []
+
+        for name, help_text in sorted(COUNTERS.items()):
+            lines.append("# HELP %s %s" % (name, help_text))
+            lines.append("# TYPE %s counter" % name)
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append("%s%s %s" % (name, format_labels(labels), value))
+
+        for name, (help_text, buckets) in sorted(HISTOGRAMS.items()):
+            lines.append("# HELP %s %s" % (name, help_text))
+            lines.append("# TYPE %s histogram" % name)
+            for (metric, labels), value in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                for bound, count in zip(buckets, value):
+                    lines.append("%s_bucket%s %s" % (
+                        name, format_labels(labels + (("le", str(bound)),)),
+                        count))
+                lines.append("%s_bucket%s %s" % (
+                    name, format_labels(labels + (("le", "+Inf"),)), value[-1]))
+                lines.append("%s_sum%s %s" % (
+                    name, format_labels(labels), value[-2]))
+                lines.append("%s_count%s %s" % (
+                    name, format_labels(labels), value[-1]))
+
+        return "\n".join(lines) + "\n"
+
+
+def format_labels(labels):
+    return "{%s}" % ",".join(
+        '%s="%s"' % (key, value.replace("\\", "\\\\")
+            .replace("\n", "\\n").replace('"', '\\"'))
+        for key, value in labels)
+
+
+_registry = None
+
+
+def get_registry():
+    """ returns the process wide registry, configured from settings """
+    global _registry
+    if _registry is None:
+        directory = getattr(settings, "VIEWSETS_METRICS_DIR", None)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        _registry = MetricsRegistry(directory)
+    return _registry
+
+
+def metered_view(viewset, name, view):
+    """ wraps a view function so every request is added to the registry """
+
+    @wraps(view)
+    def inner(request, *args, **kwargs):
+        with recording(request, "%s:%s" % (viewset.name, name)) as timings:
+            queries = timings.queries
+            started = time.perf_counter()
+            response = render_response(
+                view(request, *args, **kwargs), timings)
+            duration = time.perf_counter() - started
+
+        registry = get_registry()
+        labels = (("viewset", viewset.name), ("view", name))
+        registry.inc("viewsets_requests_total",
+            labels + (("status", str(response.status_code)),))
+        registry.observe("viewsets_request_duration_seconds", labels, duration)
+        registry.observe("viewsets_request_queries", labels,
+            timings.queries - queries)
+
+        action = timings.annotations.get("action")
+        if action and "action" in timings.stages:
+            registry.observe("viewsets_action_duration_seconds",
+                labels + (("action", action),),
+                timings.stages["action"][0] / 1000.0)
+        return response
+
+    return inner
+
+
+def metrics_view(request):
+    return HttpResponse(get_registry().render(),
+        content_type="text/plain; version=0.0.4; charset=utf-8")
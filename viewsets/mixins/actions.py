@@ -1,15 +1,42 @@
 from collections import OrderedDict as SortedDict
 
-from django.http import HttpResponse
+from django.db import models
+from django.http import HttpResponse, JsonResponse
 from django.shortcuts import redirect, render
 from django.utils.encoding import force_text
 from django.utils.translation import ugettext_lazy as _
 
+from ..cache import invalidate_model
+from ..deletion import cascade_summary
+from ..executor import ChunkedExecutor
+from ..forms import BulkUpdateForm
+from ..selection import Selection
+from ..timing import annotate, stage
+
 
 class NoActionFound(Exception):
     pass
 
 
+def delete_objects(queryset):
+    """ deletes one object at a time so signals and delete() overrides run """
+    count = 0
+    for obj in queryset:
+        obj.delete()
+        count += 1
+    return count
+
+
+def update_objects(queryset, field, value):
+    """ sets the field and saves each object whose value differs """
+    count = 0
+    for obj in queryset.exclude(**{field: value}):
+        setattr(obj, field, value)
+        obj.save()
+        count += 1
+    return count
+
+
 class ActionMixin(object):
     """
     allows the view to perform actions on list items
@@ -19,23 +46,114 @@ class ActionMixin(object):
     selected_name = "selected"
     actions = []  # ['delete_selected']
     delete_selected_template = "base/actions/delete_selected.html"
+    update_selected_template = "base/actions/update_selected.html"
+
+    # objects listed by the delete_selected confirmation
+    delete_selected_sample_size = 20
+
+    # select_across actions work on a snapshot of the selected pks, kept
+    # this many seconds, None filters and searches again on every step
+    selection_name = "selection"
+    selection_timeout = 600
+    selection = None
+    selection_error = None
+
+    # actions marked `chunked = True` get one queryset per chunk of this many
+    # rows, each in its own transaction. with action_lock_rows the rows are
+    # locked with select_for_update(skip_locked=True), an action can set
+    # `chunk_size` and `lock_rows` itself
+    action_chunk_size = 500
+    action_lock_rows = False
+    action_summary = None
+
+    # fields the update_selected action can set. it runs one UPDATE per
+    # chunk, bulk_update_save saves the objects one by one instead, for
+    # models whose save() does more than writing the row
+    bulk_update_fields = []
+    bulk_update_save = False
 
     # you can provide your own with a mixin or by extending your class
     def delete_selected(self, request, queryset):
-        if "confirmed" in request.POST:
-            for obj in queryset:
-                # calling individual deletes so triggers will run
-                obj.delete()
+        if self.is_confirmed():
+            summary = self.execute_action(delete_objects, queryset)
+            if summary.failed or request.is_ajax():
+                return self.get_summary_response(summary)
             return redirect(".")
+
+        sample, deleted, protected = queryset, [], []
+        if self.selection is not None:
+            # the snapshot may be too fragmented for one queryset, the
+            # summary is added up over bounded chunks of it
+            sample = next(self.get_selection_chunks(
+                self.delete_selected_sample_size), queryset.none())
+            deleted, protected = cascade_summary(self.get_selection_chunks())
+        elif self.selection_error is None:
+            deleted, protected = cascade_summary(queryset)
         return render(request, self.delete_selected_template, {
             "selected_name": self.selected_name,
             "action_name": self.action_name,
             "action": request.POST.get(self.action_name),
             "queryset": queryset,
+            "count": queryset.count() if self.selection is None
+                else self.selection.count,
+            "sample": sample[:self.delete_selected_sample_size],
+            "cascade": deleted,
+            "protected": protected,
+            "select_across": request.POST.get("select_across"),
+            "selection_name": self.selection_name,
+            "selection": self.selection,
+            "error": self.selection_error,
+            "selected": request.POST.getlist(self.selected_name),
             "opts": queryset.model._meta
         })
     delete_selected.short_description = _("Delete selected %(verbose_name_plural)s")
 
+    def update_selected(self, request, queryset):
+        form = None
+        if self.is_confirmed():
+            form = request.POST
+        form = self.get_bulk_update_form(form)
+
+        if form.is_bound and form.is_valid():
+            field = form.cleaned_data["field"]
+            value = form.cleaned_data["value"]
+            if self.get_bulk_update_save():
+                func = lambda chunk: update_objects(chunk, field, value)
+            else:
+                # rows that already hold the value aren't written again
+                func = lambda chunk: chunk.exclude(**{field: value}) \
+                    .update(**{field: value})
+            summary = self.execute_action(func, queryset)
+            if summary.changed:
+                # UPDATE sends no post_save to drop the cached objects
+                invalidate_model(self.model)
+            return self.get_summary_response(summary)
+
+        return render(request, self.update_selected_template, {
+            "selected_name": self.selected_name,
+            "action_name": self.action_name,
+            "action": request.POST.get(self.action_name),
+            "form": form,
+            "count": queryset.count() if self.selection is None
+                else self.selection.count,
+            "select_across": request.POST.get("select_across"),
+            "selection_name": self.selection_name,
+            "selection": self.selection,
+            "error": self.selection_error,
+            "selected": request.POST.getlist(self.selected_name),
+            "opts": queryset.model._meta
+        })
+    update_selected.short_description = _("Update selected %(verbose_name_plural)s")
+
+    def get_bulk_update_fields(self):
+        return self.bulk_update_fields
+
+    def get_bulk_update_save(self):
+        return self.bulk_update_save
+
+    def get_bulk_update_form(self, data=None):
+        return BulkUpdateForm(self.model, self.get_bulk_update_fields(), data)
+
     def get_actions(self):
         return self.actions
 
@@ -77,15 +195,100 @@ class ActionMixin(object):
             action_name=self.action_name,
             selected_name=self.selected_name,
             actions=actions,
+            action_summary=self.action_summary,
+            selection_error=self.selection_error,
             **kwargs)
 
+    def get_list_queryset(self):
+        queryset = self.get_queryset()
+
+        # annotations only feed the list's columns, leave them out
+        counted, unannotated = getattr(self, "count_queryset", None) or \
+            (None, None)
+        if counted is queryset:
+            queryset = unannotated
+        return queryset
+
+    def get_selection_queryset(self):
+        """ the rows a selection snapshot is applied to """
+        return self.model._default_manager.all()
+
+    def is_confirmed(self):
+        """ was the action confirmed, with a selection that's still there """
+        return "confirmed" in self.request.POST and self.selection_error is None
+
+    def get_selection(self):
+        """
+        the snapshot of a select_across selection, taken from the list on
+        the first step and loaded by its token on the following ones. a
+        token that can't be loaded sets selection_error, the list may have
+        changed since so it isn't taken again
+        """
+        token = self.request.POST.get(self.selection_name)
+        if token:
+            selection = Selection.load(self.model, token)
+            if selection is None:
+                self.selection_error = _(
+                    "The selection has expired, please select the rows again.")
+            return selection
+
+        pk = self.model._meta.pk
+        if self.selection_timeout is None or \
+                not isinstance(pk, (models.AutoField, models.IntegerField)):
+            return None
+
+        selection = Selection.from_queryset(self.get_list_queryset())
+        selection.save(self.selection_timeout)
+        return selection
+
+    def get_selection_chunks(self, chunk_size=None):
+        """ querysets of the selection's rows, chunk_size pks at most each """
+        return (chunk for pks, chunk in self.selection.querysets(
+            self.get_selection_queryset(),
+            chunk_size or self.action_chunk_size))
+
     def get_action_queryset(self, action):
+        """
+        the rows the action works on. a fragmented selection can't be one
+        queryset, actions that aren't chunked get the list's rows within
+        the selection's bounds then, execute_action walks the selection
+        """
         if self.request.POST.get("select_across"):
-            queryset = self.get_queryset()
-        else:
-            ids = self.request.POST.getlist(self.selected_name)
-            queryset = self.get_queryset().filter(id__in=ids)
-        return queryset
+            self.selection = self.get_selection()
+            if self.selection is not None and self.selection.is_fragmented():
+                return self.get_list_queryset().filter(pk__range=(
+                    self.selection.ranges[0][0], self.selection.ranges[-1][1]))
+            if self.selection is not None:
+                return self.selection.filter(self.get_selection_queryset())
+            if self.selection_error is not None:
+                return self.get_selection_queryset().none()
+            return self.get_list_queryset()
+
+        ids = self.request.POST.getlist(self.selected_name)
+        return self.get_list_queryset().filter(id__in=ids)
+
+    def execute_action(self, func, queryset, chunk_size=None, lock=None):
+        """
+        runs func(chunk) over the queryset chunk by chunk, each chunk in its
+        own transaction, and returns the ExecutionSummary. the chunks of a
+        select_across selection are taken from its snapshot instead
+        """
+        if self.selection is not None:
+            queryset = self.get_selection_queryset()
+        executor = ChunkedExecutor(
+            queryset,
+            chunk_size=chunk_size or self.action_chunk_size,
+            lock=self.action_lock_rows if lock is None else lock,
+            action=self.request.POST.get(self.action_name),
+            selection=self.selection)
+        self.action_summary = executor.run(func)
+        return self.action_summary
+
+    def get_summary_response(self, summary):
+        """ the summary as json for ajax requests, None renders the list """
+        if self.request.is_ajax():
+            return JsonResponse(summary.as_dict())
+        return None
 
     def perform_action(self, action):
         """
@@ -95,7 +298,19 @@ class ActionMixin(object):
         if action and action in self.action_list:
             title, func = self.action_list.get(action)
             queryset = self.get_action_queryset(action)
-            response = func(self.request, queryset)
+            annotate(self.request, action=action)
+            with stage(self.request, "action"):
+                if getattr(func, "chunked", False):
+                    if self.selection_error is not None:
+                        # the list shows selection_error instead
+                        return None
+                    summary = self.execute_action(
+                        lambda chunk: func(self.request, chunk), queryset,
+                        chunk_size=getattr(func, "chunk_size", None),
+                        lock=getattr(func, "lock_rows", None))
+                    response = self.get_summary_response(summary)
+                else:
+                    response = func(self.request, queryset)
             if isinstance(response, HttpResponse):
                 response['Cache-Control'] = 'no-cache, no-store, must-revalidate'
                 response['Pragma'] = "no-cache"
@@ -1,113 +1,18 @@
 from six.moves.urllib.parse import parse_qs
-from itertools import groupby
 from operator import itemgetter
 
-from django.contrib.admin.filters import SimpleListFilter, FieldListFilter, \
-    ListFilter
-from django.contrib.admin.options import IncorrectLookupParameters
-from django.contrib.admin.views.main import IGNORED_PARAMS
-from django.core.exceptions import ValidationError
 from django.db import models
 from django.utils.http import urlencode
 from .base import SessionDataMixin
-from django.contrib.contenttypes.models import ContentType
-
-
-class QuerysetListFilter(SimpleListFilter):
-
-    def get_choices_queryset(self):
-        raise NotImplementedError
-
-    def get_choice_label(self, obj):
-        return unicode(obj)
-
-    def lookups(self, request, model_admin):
-        for obj in self.get_choices_queryset(request, model_admin):
-            yield (obj.pk, self.get_choice_label(obj))
-
-    def queryset(self, request, queryset):
-        try:
-            return queryset.filter(**self.used_parameters)
-        except ValidationError as e:
-            raise IncorrectLookupParameters(e)
-
-
-class GenericQuerysetListFilter(ListFilter):
-    ct_field = "content_type"
-    fk_field = "object_id"
-
-    def __init__(self, request, params, model, model_admin):
-        super(GenericQuerysetListFilter, self).__init__(
-            request, params, model, model_admin)
-
-        lookup_choices = self.lookups(request, model_admin)
-        if lookup_choices is None:
-            lookup_choices = ()
-        self.lookup_choices = list(lookup_choices)
-        for param in self.expected_parameters():
-            if param in params:
-                value = params.pop(param)
-                self.used_parameters[param] = value
-
-    def get_base_queryset(self, request, model_admin):
-        raise NotImplemented
-
-    def get_choices_queryset(self, request, model_admin):
-        qs = self.get_base_queryset(request, model_admin)\
-            .distinct()\
-            .values(self.ct_field, self.fk_field)\
-            .order_by(self.ct_field)
-        retval = groupby(qs, key=lambda a: a[self.ct_field])
-        return retval
-
-    def get_choice_label(self, obj):
-        return unicode(obj)
-
-    def lookups(self, request, model_admin):
-        for ct, pks in self.get_choices_queryset(request, model_admin):
-            pks = [obj[self.fk_field] for obj in pks]
-            if ct:
-                qs = ContentType.objects.get_for_id(ct).get_all_objects_for_this_type(pk__in=pks)
-                for obj in qs:
-                    yield (ct, obj.pk, self.get_choice_label(obj))
-            else:
-                yield (None, None, "None")
-
-    def queryset(self, request, queryset):
-        try:
-            return queryset.filter(**self.used_parameters)
-        except ValidationError as e:
-            raise IncorrectLookupParameters(e)
-
-    def choices(self, cl):
-        yield {
-            'selected': len(self.used_parameters.keys()) == 0,
-            'query_string': cl.get_query_string({}, self.expected_parameters()),
-            'display': 'All',
-        }
-        for ct, lookup, title in self.lookup_choices:
-            if ct is None:
-                lookup_dict = {
-                    self.ct_field + "__isnull": "True",
-                    self.fk_field + "__isnull": "True"
-                }
-            else:
-                lookup_dict = {
-                    self.ct_field + "__exact": str(ct),
-                    self.fk_field + "__exact": str(lookup)
-                }
-            yield {
-                'selected': self.used_parameters == lookup_dict,
-                'query_string': cl.get_query_string(lookup_dict, []),
-                'display': title,
-            }
 
-    def expected_parameters(self):
-        return [self.ct_field + "__exact", self.fk_field + "__exact",
-            self.ct_field + "__isnull", self.fk_field + "__isnull"]
 
-    def has_output(self):
-        return len(self.lookup_choices) > 0
+def __getattr__(name):
+    # the list filters subclass the admin's, which pulls in the whole
+    # admin, so they're only imported when asked for
+    if name in ("QuerysetListFilter", "GenericQuerysetListFilter"):
+        from . import list_filters
+        return getattr(list_filters, name)
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
 
 
 class FakeRequest(object):
@@ -131,6 +36,9 @@ class FilterMixin(SessionDataMixin):
         return self.list_filter
 
     def get_filter_classes(self):
+        from django.contrib.admin.filters import FieldListFilter
+        from django.contrib.admin.views.main import IGNORED_PARAMS
+
         lookup_params = self.get_data()
 
         # Remove all the parameters that are globally and systematically
@@ -212,34 +120,45 @@ class FilterMixin(SessionDataMixin):
 
         return '?' + urlencode(p)
 
+    def prepare_filter_items(self, spec):
+        spec.items = list(spec.choices(self))
+
+        # add in all possible removes
+        # to be able to clear the session data
+        remove_keys = set()
+        for item in spec.items:
+            if "_remove=" not in spec.items:
+                for key in parse_qs(item['query_string'].strip("?")).keys():
+                    remove_keys.add(key)
+
+        for item in spec.items:
+            if "_remove=" not in spec.items:
+                if not item['query_string'].endswith("?"):
+                    item['query_string'] += "&"
+                item['query_string'] += "_remove={}".format(
+                    ",".join(remove_keys)
+                )
+
+    def get_rendered_filters(self):
+        """ the filter specs with their choices, built on first use """
+        for spec in self.filters:
+            if not hasattr(spec, "items"):
+                self.prepare_filter_items(spec)
+        return self.filters
+
     def get_filtered_queryset(self, queryset=None):
-        if not queryset:
+        if queryset is None:
             queryset = super(FilterMixin, self).get_queryset(queryset)
 
-        if not self.original_queryset:
+        if self.original_queryset is None:
             self.original_queryset = queryset
 
+        # every spec is applied, a filter may narrow the queryset without
+        # its parameter, their choices are only built when rendered
         self.filters = self.get_filter_classes()
 
         for f in self.filters:
             queryset = f.queryset(self.request, queryset)
-            f.items = list(f.choices(self))
-
-            # add in all possible removes
-            # to be able to clear the session data
-            remove_keys = set()
-            for item in f.items:
-                if "_remove=" not in f.items:
-                    for key in parse_qs(item['query_string'].strip("?")).keys():
-                        remove_keys.add(key)
-
-            for item in f.items:
-                if "_remove=" not in f.items:
-                    if not item['query_string'].endswith("?"):
-                        item['query_string'] += "&"
-                    item['query_string'] += "_remove={}".format(
-                        ",".join(remove_keys)
-                    )
 
         return queryset
 
@@ -249,5 +168,5 @@ class FilterMixin(SessionDataMixin):
     def get_context_data(self, **kwargs):
         kwargs['original_queryset'] = kwargs.get("original_queryset", self.original_queryset)
         return super(FilterMixin, self).get_context_data(
-            filters=getattr(self, "filters", []),
+            filters=self.get_rendered_filters() if hasattr(self, "filters") else [],
             **kwargs)
@@ -0,0 +1,103 @@
+from itertools import groupby
+
+from django.contrib.admin.filters import SimpleListFilter, ListFilter
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ValidationError
+
+
+class QuerysetListFilter(SimpleListFilter):
+
+    def get_choices_queryset(self):
+        raise NotImplementedError
+
+    def get_choice_label(self, obj):
+        return unicode(obj)
+
+    def lookups(self, request, model_admin):
+        for obj in self.get_choices_queryset(request, model_admin):
+            yield (obj.pk, self.get_choice_label(obj))
+
+    def queryset(self, request, queryset):
+        try:
+            return queryset.filter(**self.used_parameters)
+        except ValidationError as e:
+            raise IncorrectLookupParameters(e)
+
+
+class GenericQuerysetListFilter(ListFilter):
+    ct_field = "content_type"
+    fk_field = "object_id"
+
+    def __init__(self, request, params, model, model_admin):
+        super(GenericQuerysetListFilter, self).__init__(
+            request, params, model, model_admin)
+
+        lookup_choices = self.lookups(request, model_admin)
+        if lookup_choices is None:
+            lookup_choices = ()
+        self.lookup_choices = list(lookup_choices)
+        for param in self.expected_parameters():
+            if param in params:
+                value = params.pop(param)
+                self.used_parameters[param] = value
+
+    def get_base_queryset(self, request, model_admin):
+        raise NotImplemented
+
+    def get_choices_queryset(self, request, model_admin):
+        qs = self.get_base_queryset(request, model_admin)\
+            .distinct()\
+            .values(self.ct_field, self.fk_field)\
+            .order_by(self.ct_field)
+        retval = groupby(qs, key=lambda a: a[self.ct_field])
+        return retval
+
+    def get_choice_label(self, obj):
+        return unicode(obj)
+
+    def lookups(self, request, model_admin):
+        for ct, pks in self.get_choices_queryset(request, model_admin):
+            pks = [obj[self.fk_field] for obj in pks]
+            if ct:
+                qs = ContentType.objects.get_for_id(ct).get_all_objects_for_this_type(pk__in=pks)
+                for obj in qs:
+                    yield (ct, obj.pk, self.get_choice_label(obj))
+            else:
+                yield (None, None, "None")
+
+    def queryset(self, request, queryset):
+        try:
+            return queryset.filter(**self.used_parameters)
+        except ValidationError as e:
+            raise IncorrectLookupParameters(e)
+
+    def choices(self, cl):
+        yield {
+            'selected': len(self.used_parameters.keys()) == 0,
+            'query_string': cl.get_query_string({}, self.expected_parameters()),
+            'display': 'All',
+        }
+        for ct, lookup, title in self.lookup_choices:
+            if ct is None:
+                lookup_dict = {
+                    self.ct_field + "__isnull": "True",
+                    self.fk_field + "__isnull": "True"
+                }
+            else:
+                lookup_dict = {
+                    self.ct_field + "__exact": str(ct),
+                    self.fk_field + "__exact": str(lookup)
+                }
+            yield {
+                'selected': self.used_parameters == lookup_dict,
+                'query_string': cl.get_query_string(lookup_dict, []),
+                'display': title,
+            }
+
+    def expected_parameters(self):
+        return [self.ct_field + "__exact", self.fk_field + "__exact",
+            self.ct_field + "__isnull", self.fk_field + "__isnull"]
+
+    def has_output(self):
+        return len(self.lookup_choices) > 0
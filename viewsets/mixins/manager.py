@@ -1,17 +1,34 @@
 import os
+from collections import namedtuple
 from copy import deepcopy
 
 from django.urls import reverse
 
 from ..mixins.search import SearchMixin
+from ..timing import stage
 from .filter import FilterMixin
 from .sort import SortMixin, TableMixin
 
 
+class ListState(namedtuple("ListState", "queryset filters search sort")):
+    """ a list's queryset and the filter specs, search and sort behind it """
+
+    def describe(self):
+        return {
+            "filters": dict(
+                (key, value)
+                for spec in self.filters
+                for key, value in spec.used_parameters.items()),
+            "search": self.search,
+            "sort": list(self.sort),
+        }
+
+
 class ViewSetMixin(object):
     list_detail_link = "base:detail"
     title = None
     paginate_by = None
+    list_state = None
 
     def get_title(self):
         if self.title:
@@ -108,22 +125,64 @@ class ViewSetMixin(object):
         else:
             return super(ViewSetMixin, self).get_action(name)
 
+    def get_bulk_update_fields(self):
+        return super(ViewSetMixin, self).get_bulk_update_fields() or \
+            getattr(self.manager, "bulk_update_fields", [])
+
+    def get_bulk_update_save(self):
+        return super(ViewSetMixin, self).get_bulk_update_save() or \
+            getattr(self.manager, "bulk_update_save", False)
+
+    def get_selection_queryset(self):
+        return self.manager.get_queryset(self, self.request, **self.kwargs)
+
+    def get_list_state(self):
+        """
+        builds the filtered, searched and sorted queryset once per request,
+        later calls (actions, rendering) share it
+        """
+        if self.list_state is None:
+            capture = getattr(self.request, "viewset_capture", None)
+            if capture is not None:
+                capture.view = self
+            self.list_state = self.build_list_state()
+        return self.list_state
+
+    def build_list_state(self):
+        with stage(self.request, "queryset"):
+            qs = self.manager.get_queryset(self, self.request, **self.kwargs)
+
+        if isinstance(self, TableMixin):
+            select_related = getattr(self.manager, "list_select_related", ())
+            if select_related is True:
+                qs = qs.select_related()
+            elif select_related:
+                qs = qs.select_related(*select_related)
+
+        filters, search, sort = (), "", ()
+        if isinstance(self, FilterMixin):
+            with stage(self.request, "filter"):
+                qs = self.get_filtered_queryset(qs)
+            filters = tuple(self.filters)
+        if isinstance(self, SearchMixin):
+            with stage(self.request, "search"):
+                qs = self.get_searched_queryset(qs)
+            search = self.query
+        if isinstance(self, SortMixin):
+            with stage(self.request, "sort"):
+                qs = self.get_sorted_queryset(qs)
+            sort = tuple(self.sorting_fields)
+        return ListState(qs, filters, search, sort)
+
     def get_queryset(self, request=None):
         """
         gets queryset from manager,
         accepts request to be compatible with admin filters
         """
-        qs = self.manager.get_queryset(self, self.request, **self.kwargs)
-
         # if request is passed, this is an admin filter
         # and it will do filtering separately
         if request:
-            return qs
+            with stage(self.request, "queryset"):
+                return self.manager.get_queryset(self, self.request, **self.kwargs)
 
-        if isinstance(self, FilterMixin):
-            qs = self.get_filtered_queryset(qs)
-        if isinstance(self, SearchMixin):
-            qs = self.get_searched_queryset(qs)
-        if isinstance(self, SortMixin):
-            qs = self.get_sorted_queryset(qs)
-        return qs
+        return self.get_list_state().queryset
@@ -45,7 +45,7 @@ class SearchMixin(SessionDataMixin):
         if queryset is None:
             queryset = super(SearchMixin, self).get_queryset(queryset)
 
-        if not self.original_queryset:
+        if self.original_queryset is None:
             self.original_queryset = queryset
 
         queryset = self.perform_search(queryset)
@@ -1,5 +1,7 @@
 from __future__ import print_function
 
+from collections import OrderedDict as SortedDict
+
 import six
 from django.db import models
 from django.db.models.base import ModelBase
@@ -10,6 +12,8 @@ from django.utils.html import escape
 from django.utils.safestring import mark_safe
 from django.utils.translation import ugettext as _
 
+from ..columns import AnnotatedColumn
+from ..timing import is_timed, stage
 from .base import SessionDataMixin
 
 
@@ -124,6 +128,10 @@ class TableField(object):
     def sort(self):
         return None
 
+    def prepare(self, objects):
+        """ called with the objects of the page before any value """
+        pass
+
     def value(self, instance):
         return six.text_type(instance)
 
@@ -144,10 +152,28 @@ class UnicodeTableField(TableField):
 
 
 class CallableTableField(TableField):
+    """
+    a function of the row, or with `batch = True` a function of all the
+    rows of the page returning a mapping of pk to value
+    """
+    values = None
+    error = None
 
     def valid(self):
         return callable(self.field)
 
+    def prepare(self, objects):
+        if not getattr(self.field, "batch", False):
+            return
+        try:
+            if hasattr(self.field, "requires_request"):
+                self.values = self.field(self.view.request, objects)
+            else:
+                self.values = self.field(objects)
+        except Exception as ex:
+            # raised again from every cell, which shows it like any error
+            self.error = ex
+
     def header(self):
         return getattr(self.field, "short_description",
             self.field.__name__.replace("_", " ").title())
@@ -156,11 +182,30 @@ class CallableTableField(TableField):
         return getattr(self.field, "sort_field", None)
 
     def value(self, instance):
+        if self.error is not None:
+            raise self.error
+        if self.values is not None:
+            return self.values.get(instance.pk)
         if hasattr(self.field, "requires_request"):
             return self.field(self.view.request, instance)
         return self.field(instance)
 
 
+class AnnotatedTableField(TableField):
+
+    def valid(self):
+        return isinstance(self.field, AnnotatedColumn)
+
+    def header(self):
+        return self.field.short_description
+
+    def sort(self):
+        return self.field.sort_field
+
+    def value(self, instance):
+        return getattr(instance, self.field.name, None)
+
+
 class ViewCallableTableField(CallableTableField):
 
     def valid(self):
@@ -251,8 +296,34 @@ class TableMixin(SortMixin):
     list_display_links = []
     list_editable = None  # NOT Implemented
     list_detail_link = ""
-    field_sources = [UnicodeTableField, CallableTableField, ModelTableField,
-        ViewCallableTableField, ManagerCallableTableField]
+    count_queryset = None
+    field_sources = [UnicodeTableField, AnnotatedTableField,
+        CallableTableField, ModelTableField, ViewCallableTableField,
+        ManagerCallableTableField]
+
+    def get_annotations(self):
+        """ the expressions of the AnnotatedColumns in list_display """
+        return SortedDict(
+            (field.name, field.expression)
+            for field in self.get_list_display()
+            if isinstance(field, AnnotatedColumn))
+
+    def get_sorted_queryset(self, queryset=None):
+        # annotate first so the annotated columns can be sorted on
+        if queryset is None:
+            queryset = super(SortMixin, self).get_queryset(queryset)
+
+        annotations = self.get_annotations()
+        if not annotations:
+            return super(TableMixin, self).get_sorted_queryset(queryset)
+
+        unannotated = queryset
+        queryset = super(TableMixin, self).get_sorted_queryset(
+            queryset.annotate(**annotations))
+        # annotations don't change the row count, pagination can count
+        # without their joins and grouping
+        self.count_queryset = (queryset, unannotated)
+        return queryset
 
     def get_allowed_sort_fields(self, model):
         self._list_display = self.prepare_list_display()
@@ -299,6 +370,10 @@ class TableMixin(SortMixin):
             yield Header(field.header(), sort_field, sorting)
 
     def get_rows(self, object_list, list_display):
+        object_list = list(object_list)
+        for field in list_display:
+            field.prepare(object_list)
+
         for obj in object_list:
             yield obj, self.get_row(obj, list_display)
 
@@ -338,9 +413,15 @@ class TableMixin(SortMixin):
             list_display_links=self.get_list_display_links(),
             **kwargs)
         object_list = context.get("object_list")
+        rows = self.get_rows(object_list, list_display)
+        if is_timed(self.request):
+            # rows are lazy, evaluate them here so they aren't
+            # counted as part of the template rendering
+            with stage(self.request, "rows"):
+                rows = [(obj, list(row)) for obj, row in rows]
         context.update(
             headers=self.get_headers(object_list, list_display),
-            rows=self.get_rows(object_list, list_display)
+            rows=rows
         )
         return context
 #
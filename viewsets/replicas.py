@@ -0,0 +1,69 @@
+"""
+sends the reads of safe requests to a replica database
+
+    DATABASE_ROUTERS = ["viewsets.replicas.ReadReplicaRouter"]
+
+    class OrderViewSet(ViewSet):
+        read_using = "replica"                  # list, detail, autocomplete
+        read_using = {"list": "replica"}        # or per view
+
+every query of a routed GET, filter choices included, reads from the
+replica. other methods stay on the primary and set a cookie that keeps the
+client's reads on the primary for `read_your_writes` seconds, so the page
+redirected to after a write shows it.
+"""
+from contextvars import ContextVar
+from functools import wraps
+
+from .timing import get_timings, render_response
+
+_read_alias = ContextVar("viewsets_read_alias", default=None)
+
+PIN_COOKIE = "viewsets_primary"
+READ_VIEWS = ("list", "detail", "autocomplete", "export")
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+class ReadReplicaRouter(object):
+    """ routes reads to the replica of the view being served, if any """
+
+    # sessions and users are read fresh, a login must take effect at once
+    primary_apps = ("sessions", "auth")
+
+    def db_for_read(self, model, **hints):
+        alias = _read_alias.get()
+        if alias and model._meta.app_label not in self.primary_apps:
+            return alias
+        return None
+
+
+def get_read_alias():
+    return _read_alias.get()
+
+
+def routed_view(viewset, name, view):
+    """ wraps a view function so safe requests read from the replica """
+
+    @wraps(view)
+    def inner(request, *args, **kwargs):
+        if request.method not in SAFE_METHODS:
+            response = view(request, *args, **kwargs)
+            if viewset.read_your_writes:
+                response.set_cookie(PIN_COOKIE, "1",
+                    max_age=viewset.read_your_writes, httponly=True)
+            return response
+
+        alias = viewset.get_read_using(name)
+        if not alias or PIN_COOKIE in request.COOKIES:
+            return view(request, *args, **kwargs)
+
+        token = _read_alias.set(alias)
+        try:
+            # templates query too, render while still routed
+            response = render_response(
+                view(request, *args, **kwargs), get_timings(request))
+        finally:
+            _read_alias.reset(token)
+        return response
+
+    return inner
@@ -0,0 +1,154 @@
+"""
+snapshots of select_across selections
+
+the pks the list showed when the action was picked are stored in the cache,
+as ranges or a bitmap whichever is smaller, and the following steps of the
+action (its confirmation, a background job) work on exactly those rows
+instead of filtering and searching again
+"""
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import EmptyResultSet
+from django.db.models import Q
+
+KEY_PREFIX = "viewsets:selection"
+
+
+def get_cache():
+    return caches[getattr(settings, "VIEWSETS_SELECTION_CACHE", "default")]
+
+
+def to_ranges(pks):
+    """ folds sorted integer pks into inclusive (start, end) runs """
+    ranges = []
+    for pk in pks:
+        if ranges and ranges[-1][1] == pk - 1:
+            ranges[-1][1] = pk
+        else:
+            ranges.append([pk, pk])
+    return ranges
+
+
+def to_bitmap(ranges):
+    start = ranges[0][0]
+    bitmap = bytearray((ranges[-1][1] - start) // 8 + 1)
+    for first, last in ranges:
+        for pk in range(first - start, last - start + 1):
+            bitmap[pk >> 3] |= 1 << (pk & 7)
+    return start, bytes(bitmap)
+
+
+def from_bitmap(start, bitmap):
+    def pks():
+        for index, byte in enumerate(bitmap):
+            if byte:
+                for bit in range(8):
+                    if byte & (1 << bit):
+                        yield start + index * 8 + bit
+    return to_ranges(pks())
+
+
+def range_filter(ranges):
+    q = Q()
+    for first, last in ranges:
+        q |= Q(pk=first) if first == last else Q(pk__range=(first, last))
+    return q
+
+
+class Selection(object):
+    """ a stored set of pks, as runs of consecutive integers """
+
+    # a selection with more runs than this is only walked in chunks
+    max_ranges = 100
+
+    def __init__(self, model, ranges, token=None, created=None, sql=""):
+        self.model = model
+        self.ranges = ranges
+        self.token = token or uuid.uuid4().hex
+        self.created = created or time.time()
+        self.sql = sql
+        self.count = sum(last - first + 1 for first, last in ranges)
+
+    @classmethod
+    def from_queryset(cls, queryset):
+        pks = queryset.order_by("pk").values_list("pk", flat=True)
+        try:
+            sql = str(queryset.query)
+        except EmptyResultSet:
+            # a .none() queryset has no sql
+            sql = ""
+        return cls(queryset.model, to_ranges(pks.iterator()), sql=sql)
+
+    @classmethod
+    def load(cls, model, token):
+        """ the stored selection, None when expired or of another model """
+        data = get_cache().get("%s:%s" % (KEY_PREFIX, token))
+        if not data or data["model"] != model._meta.label_lower:
+            return None
+        if data["encoding"] == "bitmap":
+            ranges = from_bitmap(*data["pks"])
+        else:
+            ranges = data["pks"]
+        return cls(model, ranges, token, data["created"], data["sql"])
+
+    def save(self, timeout):
+        encoding, pks = "ranges", self.ranges
+        if self.ranges:
+            span = self.ranges[-1][1] - self.ranges[0][0] + 1
+            # two ints per run against a bit per pk in the span
+            if len(self.ranges) * 16 > span // 8:
+                encoding, pks = "bitmap", to_bitmap(self.ranges)
+        get_cache().set("%s:%s" % (KEY_PREFIX, self.token), {
+            "model": self.model._meta.label_lower,
+            "created": self.created,
+            "sql": self.sql,
+            "encoding": encoding,
+            "pks": pks,
+        }, timeout)
+
+    def pks(self):
+        for first, last in self.ranges:
+            for pk in range(first, last + 1):
+                yield pk
+
+    def chunks(self, size):
+        """ yields lists of at most size pks """
+        chunk = []
+        for pk in self.pks():
+            chunk.append(pk)
+            if len(chunk) == size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def is_fragmented(self):
+        """ too many runs to be narrowed to in one condition """
+        return len(self.ranges) > self.max_ranges
+
+    def querysets(self, queryset, size):
+        """
+        yields (pks, queryset narrowed to them) for chunks of at most size
+        pks, so no statement binds more than size of them
+        """
+        for pks in self.chunks(size):
+            ranges = to_ranges(pks)
+            if len(ranges) <= self.max_ranges:
+                yield pks, queryset.filter(range_filter(ranges))
+            else:
+                yield pks, queryset.filter(pk__in=pks)
+
+    def filter(self, queryset):
+        """
+        narrows queryset to the selected rows, fragmented selections would
+        bind every pk in one statement, walk querysets() for those instead
+        """
+        if not self.ranges:
+            return queryset.none()
+        if self.is_fragmented():
+            raise ValueError("a selection of %s runs can't be narrowed to in "
+                             "one queryset" % len(self.ranges))
+        return queryset.filter(range_filter(self.ranges))
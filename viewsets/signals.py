@@ -0,0 +1,6 @@
+from django.dispatch import Signal
+
+
+# sent after a viewset view with server timing turned on has rendered
+timings_recorded = Signal(
+    providing_args=["viewset", "view_name", "request", "response", "timings"])
@@ -0,0 +1,139 @@
+"""
+captures slow queries of viewset views together with the list state
+(filters, search, sort) that produced them and the backend's EXPLAIN
+
+turn it on with `slow_query_threshold` (milliseconds) on a ViewSet,
+entries go to the "viewsets.slow_queries" logger and a bounded ring
+buffer that `ViewSet.all_urls(slow_queries_url=...)` shows to staff
+"""
+import logging
+import threading
+import time
+from collections import deque
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth.decorators import user_passes_test
+from django.db import DatabaseError, NotSupportedError, transaction
+from django.http import JsonResponse
+from django.shortcuts import render
+
+from .timing import get_timings, render_response, wrapping_connections
+
+logger = logging.getLogger("viewsets.slow_queries")
+
+
+class SlowQueryLog(object):
+    """ keeps the most recent slow queries, newest first """
+
+    def __init__(self, size=100):
+        self.lock = threading.Lock()
+        self.entries = deque(maxlen=size)
+
+    def add(self, entry):
+        with self.lock:
+            self.entries.appendleft(entry)
+        logger.warning(
+            "slow query in %s:%s (%.1fms) %s\n%s\n%s",
+            entry["viewset"], entry["view"], entry["duration_ms"],
+            entry["list_state"], entry["sql"], entry["explain"])
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __iter__(self):
+        with self.lock:
+            return iter(list(self.entries))
+
+
+slow_queries = SlowQueryLog(
+    getattr(settings, "VIEWSETS_SLOW_QUERY_LOG_SIZE", 100))
+
+
+def explain(connection, sql, params):
+    """ returns the backend's plan for sql, or an empty string """
+    try:
+        prefix = connection.ops.explain_query_prefix()
+        # a savepoint, a failed EXPLAIN mustn't abort the request's
+        # transaction on postgres
+        with transaction.atomic(using=connection.alias), \
+                connection.cursor() as cursor:
+            cursor.execute("%s %s" % (prefix, sql), params)
+            return "\n".join(
+                " ".join(str(column) for column in row)
+                for row in cursor.fetchall())
+    except (DatabaseError, NotSupportedError) as ex:
+        return "EXPLAIN failed: %s" % ex
+
+
+class SlowQueryCapture(object):
+    """ a database execute_wrapper that records selects over threshold """
+
+    def __init__(self, viewset, name, threshold, log=slow_queries):
+        self.viewset = viewset
+        self.name = name
+        self.threshold = threshold / 1000.0
+        self.log = log
+        # set by ViewSetMixin.get_list_state, describes the list state
+        self.view = None
+        self.explaining = False
+
+    def __call__(self, execute, sql, params, many, context):
+        if self.explaining or many:
+            return execute(sql, params, many, context)
+
+        started = time.perf_counter()
+        result = execute(sql, params, many, context)
+        duration = time.perf_counter() - started
+
+        if duration >= self.threshold and \
+                sql.lstrip()[:6].upper() == "SELECT":
+            self.record(context["connection"], sql, params, duration)
+        return result
+
+    def record(self, connection, sql, params, duration):
+        self.explaining = True
+        try:
+            plan = explain(connection, sql, params)
+        finally:
+            self.explaining = False
+
+        # only what's built, describing can't run queries of its own
+        list_state = getattr(self.view, "list_state", None)
+        self.log.add({
+            "viewset": self.viewset.name,
+            "view": self.name,
+            "time": time.time(),
+            "duration_ms": round(duration * 1000, 2),
+            "sql": sql,
+            "params": [str(param) for param in params or ()],
+            "list_state": list_state.describe() if list_state else {},
+            "explain": plan,
+        })
+
+
+def captured_view(viewset, name, view):
+    """ wraps a view function so its slow queries are captured """
+
+    @wraps(view)
+    def inner(request, *args, **kwargs):
+        capture = SlowQueryCapture(
+            viewset, name, viewset.slow_query_threshold)
+        request.viewset_capture = capture
+
+        with wrapping_connections(capture):
+            return render_response(
+                view(request, *args, **kwargs), get_timings(request))
+
+    return inner
+
+
+@user_passes_test(lambda user: user.is_active and user.is_staff)
+def slow_queries_view(request):
+    entries = list(slow_queries)
+    if request.GET.get("format") == "json":
+        return JsonResponse({"slow_queries": entries})
+    return render(request, "base/slow_queries.html", {
+        "slow_queries": entries,
+    })
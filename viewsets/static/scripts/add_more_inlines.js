@@ -1,4 +1,18 @@
 $(function(){
+    function renumber_form(form, prefix, index) {
+        var pattern = new RegExp(prefix + '-\\d+-', 'g');
+        var replacement = prefix + '-' + index + '-';
+        $(form).find('[name], [id], [for]').addBack().each(function(){
+            var $element = $(this);
+            $.each(['name', 'id', 'for'], function(i, attr){
+                var value = $element.attr(attr);
+                if (value) {
+                    $element.attr(attr, value.replace(pattern, replacement));
+                }
+            });
+        });
+    }
+
     $('.inline > .add-more').click(function(event){
         event.preventDefault();
         var $inline_form = $(this).parent();
@@ -13,4 +27,46 @@ $(function(){
         );
         $total_forms.val(parseInt(form_idx) + 1);
     });
-});
\ No newline at end of file
+
+    // fetches the next page of existing forms for paginated inlines,
+    // they go after the initial forms so the extra forms are renumbered
+    $('.inline > .load-more').click(function(event){
+        event.preventDefault();
+        var $button = $(this);
+        var $inline_form = $button.parent();
+        var $total_forms = $inline_form.find('[name*="TOTAL_FORMS"]');
+        var $initial_forms = $inline_form.find('[name*="INITIAL_FORMS"]');
+        var prefix = $total_forms.attr('name').replace(/-TOTAL_FORMS$/, '');
+        var initial = parseInt($initial_forms.val());
+        var total = parseInt($total_forms.val());
+
+        $.ajax({
+            url: $button.attr('data-url'),
+            data: {inline_page: $button.attr('data-page'), inline_offset: initial},
+            dataType: 'html'
+        }).done(function(html, status, xhr){
+            var $loaded = $('<div>').html(html).children('.form');
+            var count = $loaded.length;
+            var $forms = $inline_form.find('.forms').children('.form');
+
+            $forms.slice(initial).each(function(i){
+                renumber_form(this, prefix, initial + count + i);
+            });
+            if (initial > 0) {
+                $forms.eq(initial - 1).after($loaded);
+            } else {
+                $inline_form.find('.forms').prepend($loaded);
+            }
+
+            $initial_forms.val(initial + count);
+            $total_forms.val(total + count);
+
+            var next_page = xhr.getResponseHeader('X-Inline-Next-Page');
+            if (next_page) {
+                $button.attr('data-page', next_page);
+            } else {
+                $button.remove();
+            }
+        });
+    });
+});
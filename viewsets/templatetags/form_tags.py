@@ -1,8 +1,4 @@
-from crispy_forms.bootstrap import StrictButton
-from crispy_forms.helper import FormHelper
-from crispy_forms.layout import Div
 from django.template import Library
-from django.contrib.admin.helpers import AdminForm
 from django.forms.widgets import Input, CheckboxInput, Select, TextInput, \
     Textarea, CheckboxSelectMultiple
 
@@ -62,6 +58,7 @@ def fieldsets(form, fieldsets=None):
             if not klass:
                 field.widget.attrs['class'] = "form-control"
 
+    from django.contrib.admin.helpers import AdminForm
     return AdminForm(form, fieldsets, {})
 
 
@@ -82,6 +79,9 @@ def form_helper(
         label_size=4,
         label_offset=0,
         field_size=8):
+    from crispy_forms.bootstrap import StrictButton
+    from crispy_forms.helper import FormHelper
+    from crispy_forms.layout import Div
 
     helper = FormHelper()
     helper.form_tag = form_tag
@@ -1,3 +1,5 @@
+from collections import namedtuple
+
 from django import template
 from django.conf import settings
 from django.core.paginator import Paginator, InvalidPage
@@ -5,42 +7,61 @@ from django.core.paginator import Paginator, InvalidPage
 
 register = template.Library()
 
+# what the pagination template links to, without touching the queryset
+PageNumber = namedtuple("PageNumber", ["number"])
+
 
 @register.simple_tag
 def paginate(request, queryset, per_page=25, page_var="page"):
     page = request.GET.get(page_var, 1)
+    paginator = Paginator(queryset, per_page)
     try:
-        return Paginator(queryset, per_page).page(page)
+        return paginator.page(page)
     except InvalidPage:
         pass
-    return Paginator(queryset, per_page).page(1)
+    return paginator.page(1)
 
 
-@register.filter
-def pages(page, span=5):
-    paginator = page.paginator
+def page_window(number, num_pages=None, span=5, has_next=False):
+    """
+    returns PageNumbers around the current page, None marks a gap
 
-    pages = []
-    if page.has_other_pages():
+    num_pages can be None for paginators that don't count their rows,
+    then has_next decides if there is anything after the current page
+    """
+    if num_pages is None:
+        num_pages = number + 1 if has_next else number
+        more = has_next
+    else:
+        more = False
 
-        max = span * 2 + 1
-        lower_span = page.number - span
-        if max > paginator.num_pages:
-            lower_span -= max - paginator.num_pages
-            max = paginator.num_pages
+    if num_pages <= 1:
+        return []
 
-        if lower_span <= 1:
-            lower_span = 1
-        else:
-            pages += [None]
+    pages = []
+    size = span * 2 + 1
+    lower = number - span
+    if size > num_pages:
+        lower -= size - num_pages
+        size = num_pages
 
-        for idx in range(max):
-            try:
-                pages += [paginator.page(lower_span + idx)]
-            except:
-                pass
+    if lower <= 1:
+        lower = 1
+    else:
+        pages.append(None)
 
-        if lower_span + max <= paginator.num_pages:
-            pages += [None]
+    upper = min(lower + size - 1, num_pages)
+    pages.extend(PageNumber(n) for n in range(lower, upper + 1))
+
+    if more or lower + size <= num_pages:
+        pages.append(None)
 
     return pages
+
+
+@register.filter
+def pages(page, span=5):
+    num_pages = getattr(page.paginator, "num_pages", None)
+    if num_pages is None:
+        return page_window(page.number, None, span, page.has_next())
+    return page_window(page.number, num_pages, span)
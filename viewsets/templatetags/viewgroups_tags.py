@@ -1,6 +1,3 @@
-from crispy_forms.bootstrap import StrictButton
-from crispy_forms.helper import FormHelper
-from crispy_forms.layout import Div, Fieldset
 from django import template
 from django.conf import settings
 
@@ -37,6 +34,9 @@ def form_helper(
         label_size=4,
         label_offset=0,
         field_size=8):
+    from crispy_forms.bootstrap import StrictButton
+    from crispy_forms.helper import FormHelper
+    from crispy_forms.layout import Div
 
     helper = FormHelper()
     helper.form_tag = form_tag
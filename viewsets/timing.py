@@ -0,0 +1,157 @@
+"""
+per stage wall time and query counts for viewset views
+
+nothing here runs unless the ViewSet has `server_timing` turned on,
+the views only ever get the shared NULL_STAGE otherwise
+"""
+import time
+from collections import OrderedDict
+from contextlib import ExitStack, contextmanager
+from functools import wraps
+
+from django.db import connections
+
+from .signals import timings_recorded
+
+
+class NullStage(object):
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_STAGE = NullStage()
+
+
+class Stage(object):
+
+    def __init__(self, timings, name):
+        self.timings = timings
+        self.name = name
+
+    def __enter__(self):
+        self.queries = self.timings.queries
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.timings.add(
+            self.name,
+            (time.perf_counter() - self.started) * 1000,
+            self.timings.queries - self.queries)
+        return False
+
+
+class Timings(object):
+    """ collects (milliseconds, queries) per stage name """
+
+    def __init__(self, name):
+        self.name = name
+        self.queries = 0
+        self.stages = OrderedDict()
+        self.annotations = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        # installed as a database execute_wrapper to count queries
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+    def stage(self, name):
+        return Stage(self, name)
+
+    def add(self, name, duration, queries):
+        # stages that run more than once are summed
+        previous = self.stages.get(name, (0, 0))
+        self.stages[name] = (previous[0] + duration, previous[1] + queries)
+
+    def header(self):
+        """ formats the stages as a Server-Timing header value """
+        return ", ".join(
+            '%s;dur=%.2f;desc="%s queries"' % (name, duration, queries)
+            for name, (duration, queries) in self.stages.items())
+
+
+def get_timings(request):
+    """ the request's Timings, None unless timing or metrics are on """
+    return getattr(request, "viewset_timings", None)
+
+
+def stage(request, name):
+    """ times a stage of the request, a no-op unless timing is on """
+    timings = get_timings(request)
+    if timings is None:
+        return NULL_STAGE
+    return timings.stage(name)
+
+
+def is_timed(request):
+    return getattr(request, "viewset_timings", None) is not None
+
+
+def annotate(request, **values):
+    """ attaches values (like the action name) to the request's timings """
+    timings = getattr(request, "viewset_timings", None)
+    if timings is not None:
+        timings.annotations.update(values)
+
+
+@contextmanager
+def recording(request, name):
+    """
+    records the stages and queries of a request on
+    request.viewset_timings, nested wrappers share one Timings
+    """
+    timings = getattr(request, "viewset_timings", None)
+    if timings is not None:
+        yield timings
+        return
+
+    timings = Timings(name)
+    request.viewset_timings = timings
+    with wrapping_connections(timings):
+        yield timings
+
+
+@contextmanager
+def wrapping_connections(wrapper):
+    """ installs wrapper as an execute_wrapper of every connection """
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(wrapper))
+        yield wrapper
+
+
+def render_response(response, timings=None):
+    """
+    renders template responses right away, so the queries templates run
+    happen inside the wrapper that called the view
+    """
+    if hasattr(response, "render") and not response.is_rendered:
+        with timings.stage("render") if timings is not None else NULL_STAGE:
+            response.render()
+    return response
+
+
+def timed_view(viewset, name, view):
+    """
+    wraps a view function so its stages are recorded, sent with
+    the timings_recorded signal and added as a Server-Timing header
+    """
+
+    @wraps(view)
+    def inner(request, *args, **kwargs):
+        with recording(request, "%s:%s" % (viewset.name, name)) as timings:
+            with timings.stage("total"):
+                response = render_response(
+                    view(request, *args, **kwargs), timings)
+
+        response["Server-Timing"] = timings.header()
+        timings_recorded.send(
+            sender=type(viewset), viewset=viewset, view_name=name,
+            request=request, response=response, timings=timings)
+        return response
+
+    return inner
@@ -3,20 +3,31 @@ from collections import OrderedDict as SortedDict
 
 import six
 from django.core.paginator import InvalidPage
+from django.db import models
+from django.forms.models import modelform_factory
 from django.http import Http404, HttpResponse
 from django.template.defaultfilters import slugify
-from django.urls import include, path, re_path, reverse
+from django.urls import NoReverseMatch, include, path, re_path, reverse
+from django.utils.module_loading import import_string
 from django.utils.translation import ugettext_lazy as _
 from django.views.generic.base import TemplateView, View
 from django.views.generic.detail import DetailView, SingleObjectMixin
 from django.views.generic.edit import CreateView, DeleteView, UpdateView
 from django.views.generic.list import ListView, MultipleObjectMixin
 
+from .budgets import budgeted_view
+from .cache import ObjectCacheMixin, track
+from .fields import AutocompleteField
 from .mixins.actions import ActionMixin
 from .mixins.filter import FilterMixin
 from .mixins.manager import ViewSetMixin
 from .mixins.search import SearchMixin
+from .metrics import metered_view, metrics_view
 from .mixins.sort import TableMixin
+from .replicas import READ_VIEWS, routed_view
+from .slow_queries import captured_view, slow_queries_view
+from .timing import stage, timed_view
+from .widgets import AutocompleteWidget
 
 
 class AutocompleteMixin(SearchMixin):
@@ -31,11 +42,11 @@ class AutocompleteMixin(SearchMixin):
         )
 
     def to_json(self, queryset=None):
-        if not queryset:
+        if queryset is None:
             queryset = self.get_queryset()
             if not hasattr(queryset, 'searched'):
                 queryset = self.perform_search(queryset)
-            page_size = self.get_paginate_by(queryset)
+        page_size = self.get_paginate_by(queryset)
 
         return json.dumps(
             [self.dict_from_instance(p) for p in queryset[:page_size]]
@@ -46,7 +57,7 @@ class AutocompleteView(AutocompleteMixin, MultipleObjectMixin, View):
     paginate_by = 15
 
     def get(self, request, *args, **kwargs):
-        return HttpResponse(self.to_json())
+        return HttpResponse(self.to_json(), content_type="application/json")
 
 
 class AutocompleteListView(AutocompleteMixin, ListView):
@@ -63,7 +74,14 @@ class ActionListView(ActionMixin, ListView):
     page_kwarg = 'page'
 
     def paginate_queryset(self, queryset, page_size):
+        with stage(self.request, "paginate"):
+            return self._paginate_queryset(queryset, page_size)
+
+    def _paginate_queryset(self, queryset, page_size):
         paginator = self.get_paginator(queryset, page_size, allow_empty_first_page=self.get_allow_empty())
+        counted, unannotated = getattr(self, "count_queryset", None) or (None, None)
+        if counted is queryset:
+            paginator.count = unannotated.count()
         page_kwarg = self.page_kwarg
         page = self.kwargs.get(page_kwarg) or self.request.GET.get(page_kwarg) or 1
         try:
@@ -203,15 +221,29 @@ class NoDetailMixin(object):
         return reverse("base:list", current_app=self.manager.name)
 
 
-class ViewSetCreateView(ViewSetMixin, CreateView):
+class ViewSetFormMixin(object):
+    """
+    builds the model form through the manager so large foreign keys
+    get autocomplete fields, see ViewSet.autocomplete_fields
+    """
+
+    def get_form_class(self):
+        manager = getattr(self, "manager", None)
+        if self.form_class or not manager:
+            return super(ViewSetFormMixin, self).get_form_class()
+        return modelform_factory(self.model, fields=self.fields,
+            formfield_callback=manager.formfield_for_dbfield)
+
+
+class ViewSetCreateView(ViewSetMixin, ViewSetFormMixin, CreateView):
     fields = '__all__'
 
 
-class ViewSetUpdateView(ViewSetMixin, UpdateView):
+class ViewSetUpdateView(ViewSetMixin, ObjectCacheMixin, ViewSetFormMixin, UpdateView):
     fields = '__all__'
 
 
-class ViewSetDeleteView(ViewSetMixin, DeleteView):
+class ViewSetDeleteView(ViewSetMixin, ObjectCacheMixin, DeleteView):
 
     def get_success_url(self):
         return reverse(self.manager.default_app + ":list",
@@ -222,10 +254,15 @@ class ViewSetListView(ViewSetMixin, AdminListView):
     pass
 
 
-class ViewSetDetailView(ViewSetMixin, DetailView):
+class ViewSetDetailView(ViewSetMixin, ObjectCacheMixin, DetailView):
     pass
 
 
+class ViewSetAutocompleteView(ViewSetMixin, AutocompleteView):
+    # ViewSetMixin's None would fall back to the ViewSet's page size
+    paginate_by = 15
+
+
 class classproperty(property):
     def __get__(self, cls, owner):
         return self.fget.__get__(None, owner)()
@@ -253,10 +290,62 @@ class ViewSet(object):
     default_global_link = "default_global"
     default_instance_link = "default_instance"
 
+    # relations joined into the list queryset, True for all of them,
+    # like the admin's option
+    list_select_related = ()
+
+    # foreign keys rendered with autocomplete widgets in create/update,
+    # either listed by name or whose related table has more rows than
+    # the threshold (counted once per process)
+    autocomplete_fields = []
+    autocomplete_threshold = None
+
+    # serves the "autocomplete" view those widgets search this ViewSet's
+    # model with. it returns str() of any row in the queryset to whoever
+    # reaches the url, so it's opt-in
+    autocomplete = False
+
+    # adds a Server-Timing header with per stage durations and query
+    # counts to every view and sends the timings_recorded signal
+    server_timing = False
+
+    # adds every request to the metrics registry, see viewsets.metrics
+    metrics = False
+
+    # selects slower than this many milliseconds are logged with their
+    # EXPLAIN output, see viewsets.slow_queries
+    slow_query_threshold = None
+
+    # maximum queries per request by view name, e.g. {"list": 5}, and how
+    # often one sql shape may repeat before it's flagged as an N+1, see
+    # viewsets.budgets
+    query_budget = {}
+    query_repeat_limit = 5
+
+    # database alias the read views query, or a dict of view name to
+    # alias, and how many seconds a client reads from the primary after
+    # writing, see viewsets.replicas
+    read_using = None
+    read_your_writes = 5
+
+    # caches the objects of detail, update and delete views for this many
+    # seconds (True for the cache's default), with these relations and
+    # until the object or one of the dependency models changes, see
+    # viewsets.cache
+    object_cache = False
+    object_cache_select_related = ()
+    object_cache_dependencies = []
+
+    # fields the update_selected action can set, with one UPDATE per chunk
+    # or by saving each object with bulk_update_save
+    bulk_update_fields = []
+    bulk_update_save = False
+
     def __init__(self, name=None, model=None, template_dir=None, exclude=None):
 
         self.links = {self.default_global_link: []}
         self.instance_links = {self.default_instance_link: []}
+        self._related_counts = {}
 
         if exclude:
             self.exclude = exclude
@@ -274,6 +363,9 @@ class ViewSet(object):
 
         self.name = slugify(self.name)
 
+        if self.object_cache:
+            track(self.model, self.object_cache_dependencies)
+
         base_url = self.get_base_url()
 
         self.views = SortedDict()
@@ -283,11 +375,16 @@ class ViewSet(object):
             ("create", ViewSetCreateView),
             ("detail", ViewSetDetailView),
             ("update", ViewSetUpdateView),
-            ("delete", ViewSetDeleteView)
+            ("delete", ViewSetDeleteView),
+            ("autocomplete", ViewSetAutocompleteView),
         )):
+            if name == "autocomplete" and not self.autocomplete:
+                continue
             if name not in self.exclude:
                 if name in ("update", "delete",):
                     self.instance_view(name, ordering=ordering)(view)
+                elif name in ("autocomplete",):
+                    self.register(name, ordering=ordering, links=[])(view)
                 elif name in ("list",):
                     self.register(name, url=r'^$', ordering=ordering, links=[])(view)
                 elif name in ("detail",):
@@ -382,16 +479,52 @@ class ViewSet(object):
 #             view.name = name
 #             view.manager = self
             view = view.as_view(*args, **kwargs)
+            if self.read_using:
+                view = routed_view(self, name, view)
+            if self.query_budget:
+                view = budgeted_view(self, name, view)
+            if self.slow_query_threshold is not None:
+                view = captured_view(self, name, view)
+            if self.metrics:
+                view = metered_view(self, name, view)
+            if self.server_timing:
+                view = timed_view(self, name, view)
             urls.append(re_path(url_regex, view, {}, name))
 
         return urls, self.default_app, self.name
 
     @classmethod
-    def all_urls(klass):
+    def load(klass, path):
+        """
+        imports a viewset by dotted path, a ViewSet class is instantiated
+        unless its module already registered an instance of it
+        """
+        obj = import_string(path)
+        if isinstance(obj, type):
+            for manager in klass._managers:
+                if type(manager) is obj:
+                    return manager
+            obj = obj()
+        return obj
+
+    @classmethod
+    def all_urls(klass, metrics_url=None, slow_queries_url=None, viewsets=None):
+        """
+        viewsets are dotted paths to import, so their modules are only
+        loaded with the urlconf on the first url resolution
+        """
+        for viewset_path in viewsets or []:
+            klass.load(viewset_path)
+
         urls = []
         for m in klass.managers:
             patterns, app_name, namespace = m.get_urls()
             urls.append(re_path(m.get_base_url(), include((patterns, app_name), namespace=namespace)))
+        if metrics_url:
+            urls.append(re_path(metrics_url, metrics_view, name="viewsets-metrics"))
+        if slow_queries_url:
+            urls.append(re_path(slow_queries_url, slow_queries_view,
+                name="viewsets-slow-queries"))
         return urls
 
     def get_queryset(self, view, request, **kwargs):
@@ -414,12 +547,64 @@ class ViewSet(object):
 
         def inner(view):
             self.views[name] = (view, url, links)
+            if self.object_cache and issubclass(view, ObjectCacheMixin) and \
+                    "P<%s>" % view.slug_url_kwarg in url:
+                # objects are cached by the field the view looks slugs up in
+                track(self.model, self.object_cache_dependencies,
+                    view().get_slug_field())
             # self.views.keyOrder.remove(name)
             # self.views.keyOrder.insert(ordering, name)
             return view
 
         return inner
 
+    def get_read_using(self, name):
+        """ the database alias the view reads from, None for the default """
+        if isinstance(self.read_using, dict):
+            return self.read_using.get(name)
+        if name in READ_VIEWS:
+            return self.read_using
+        return None
+
+    def use_autocomplete(self, db_field):
+        """ decides if a foreign key should get an autocomplete field """
+        if not isinstance(db_field, models.ForeignKey):
+            return False
+        if db_field.name in self.autocomplete_fields:
+            return True
+        if self.autocomplete_threshold is None:
+            return False
+
+        related_model = db_field.related_model
+        if related_model not in self._related_counts:
+            self._related_counts[related_model] = \
+                related_model._default_manager.count()
+        return self._related_counts[related_model] > self.autocomplete_threshold
+
+    def get_autocomplete_url(self, model):
+        """ returns the autocomplete url of the viewset managing model """
+        for manager in ViewSet._managers:
+            if manager.model is model and "autocomplete" in manager.views:
+                try:
+                    return reverse(manager.name + ":autocomplete")
+                except NoReverseMatch:
+                    pass
+        return None
+
+    def formfield_for_dbfield(self, db_field, **kwargs):
+        """ used as the formfield_callback of create and update forms """
+        if self.use_autocomplete(db_field):
+            url = self.get_autocomplete_url(db_field.related_model)
+            if url:
+                kwargs.update(
+                    form_class=AutocompleteField,
+                    widget=AutocompleteWidget(attrs={
+                        "class": "select2",
+                        "data-url": url,
+                    })
+                )
+        return db_field.formfield(**kwargs)
+
     def instance_view(self, name, ordering=0, links=None):
         return self.register(name,
             r'^%s%s/$' % (self.object_url, name), ordering=ordering, links=links)
@@ -0,0 +1,105 @@
+"""
+builds what the first requests of a fresh process would otherwise pay for
+
+call `warmup()` once the app is loaded, e.g. at the end of wsgi.py, or
+run `manage.py viewsets_warmup` to see what it does
+"""
+import logging
+
+from django.db import models
+from django.template import TemplateDoesNotExist, TemplateSyntaxError
+from django.template.loader import select_template
+from django.test import RequestFactory
+from django.urls import get_resolver
+
+logger = logging.getLogger("viewsets.warmup")
+
+
+def get_view_classes(viewset):
+    """ yields (name, view class) of the viewset's mounted views """
+    resolver = get_resolver()
+    if viewset.name not in resolver.namespace_dict:
+        return
+    prefix, sub_resolver = resolver.namespace_dict[viewset.name]
+    for pattern in sub_resolver.url_patterns:
+        view_class = getattr(pattern.callback, "view_class", None)
+        if view_class is not None:
+            yield pattern.name, view_class
+
+
+def warmup_templates(viewset, request):
+    """ resolves the template of every view, filling the loader cache """
+    resolved = []
+    for name, view_class in get_view_classes(viewset):
+        view = view_class()
+        view.request = request
+        view.args, view.kwargs = (), {}
+        try:
+            names = view.get_template_names()
+            if isinstance(names, str):
+                names = [names]
+            template = select_template(names)
+        except (AttributeError, TemplateDoesNotExist):
+            continue
+        except TemplateSyntaxError as ex:
+            logger.warning("%s:%s template is broken: %s",
+                viewset.name, name, ex)
+            continue
+        resolved.append(template.origin.name)
+    return resolved
+
+
+def warmup_inlines(viewset, request):
+    """
+    builds the form and formset classes of the inlines of every view, the
+    Inline keeps them for the requests after
+    """
+    from .inline import ModelFormWithInlinesView
+
+    built = []
+    parent = viewset.model()
+    for name, view_class in get_view_classes(viewset):
+        if not issubclass(view_class, ModelFormWithInlinesView):
+            continue
+        view = view_class()
+        view.request = request
+        view.args, view.kwargs = (), {}
+        for inline in view.get_inlines():
+            try:
+                built.append(inline.bind(request, parent)
+                    .get_formset_class(parent))
+            except Exception as ex:
+                # e.g. a form picked by request.user, the first request
+                # builds it
+                logger.info("%s:%s inline %s is built on request: %s",
+                    viewset.name, name, inline.opts.label, ex)
+    return built
+
+
+def warmup_viewset(viewset, request):
+    opts = viewset.model._meta
+    # field and relation trees are built lazily on first lookup
+    opts.get_fields()
+
+    # the related table sizes autocomplete fields are chosen by
+    for field in opts.fields:
+        if isinstance(field, models.ForeignKey):
+            viewset.use_autocomplete(field)
+
+    return warmup_templates(viewset, request), \
+        warmup_inlines(viewset, request)
+
+
+def warmup(log=None):
+    """ warms up every registered ViewSet, log gets a line per viewset """
+    from .views import ViewSet
+
+    # imports the urlconf, which builds every viewset's url patterns
+    get_resolver().reverse_dict
+
+    request = RequestFactory().get("/")
+    for viewset in ViewSet.managers:
+        templates, formsets = warmup_viewset(viewset, request)
+        if log:
+            log("%s: %s templates, %s inline formsets" % (
+                viewset.name, len(templates), len(formsets)))
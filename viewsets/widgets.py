@@ -1,13 +1,18 @@
 from django import forms
-from django.utils.encoding import force_unicode
+from django.utils.encoding import force_text
 
 
 class AutocompleteWidget(forms.TextInput):
 
-    def render(self, name, value, attrs=None):
+    def render(self, name, value, attrs=None, renderer=None):
+        attrs = dict(attrs or {})
         if value:
+            if hasattr(value, '_meta'):
+                label, value = value, value.pk
+            else:
+                label = getattr(value, "label", value)
             attrs.update({
-                "data-text": force_unicode(value),
+                "data-text": force_text(label),
             })
-            value = value.pk
-        return forms.TextInput.render(self, name, value, attrs=attrs)
+        return forms.TextInput.render(self, name, value, attrs=attrs,
+            renderer=renderer)